@@ -3,16 +3,195 @@
 """
 #--------------------------------- Libraries ----------------------------------
 import pandas as pd
+import numpy as np
 import datatable as dt
 import sqlalchemy
-import urllib
+import pyodbc
 from typing import Union
 import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .sql_queries import *
 from .utils import *
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, the NumPy kernels are used instead
+    njit = None
+
 pd.options.mode.chained_assignment = None  # default='warn'
 
+#--------------------------------- Constants ----------------------------------
+# Columns of the comp_saldo file, in the order they come in the file:
+COMP_SALDO_COLUMNS = [
+    'nro_producto', 'nro_producto_cifrado', 'tipo_producto', 
+    'nro_identificacion','tipo_identificacion', 'codigo_producto', 
+    'franquicia', 'clase_cartera', 'cupo_aprobado', 'cupo_disponible', 
+    'saldo_capital', 'saldo_capital_empleados', 'saldo_int_cte_activo', 
+    'saldo_int_mora', 'saldo_seguros', 'saldo_productivo_cuota_manejo', 
+    'saldo_improduct_cuota_manejo', 'saldo_compras', 'compras_mes', 
+    'saldo_avances', 'valor_avances_mes', 'saldo_capital_mora', 
+    'saldo_otros_cargos', 'saldo_a_favor', 'saldo_capital_usd', 
+    'saldo_int_ctes_usd', 'saldo_int_mora_usd', 'saldo_a_favor_dolar', 
+    'saldo_total_corte', 'periodo'
+    ]
+
+# Types of the comp_saldo columns used by balance_composition. Balances are
+# kept in float64 since their sums are reported at peso precision:
+COMP_SALDO_DTYPES = {
+    'saldo_capital': dt.float64,
+    'saldo_int_cte_activo': dt.float64,
+    'saldo_int_mora': dt.float64,
+    'saldo_seguros': dt.float64,
+    'saldo_productivo_cuota_manejo': dt.float64,
+    'saldo_improduct_cuota_manejo': dt.float64,
+    'saldo_compras': dt.float64,
+    'saldo_avances': dt.float64,
+    'saldo_capital_mora': dt.float64,
+    'saldo_otros_cargos': dt.float64,
+    'saldo_a_favor': dt.float64,
+    'saldo_capital_usd': dt.float64,
+    'saldo_int_ctes_usd': dt.float64,
+    'saldo_int_mora_usd': dt.float64,
+    'saldo_a_favor_dolar': dt.float64,
+    'periodo': dt.int32,
+    }
+
+# Transaction types kept by procesar (purchases and cash advances):
+TIPOS_TRANSACCION = frozenset({1, 2, '1', '2', 'C', 'V'})
+TIPOS_COMPRA = frozenset({1, '1', 'C'})
+TIPOS_AVANCE = frozenset({2, '2', 'V'})
+
+# Transaction codes that identify a portfolio purchase (compra de cartera):
+COMPRA_CARTERA_CODES = frozenset({
+    '0I', '1C', '1D', '4I', '6H', '6I', '6K', '6L', '6V', '7A', '7B', '9Q', 
+    '9S', 'A0', 'AW', 'BW', 'D0', 'DU', 'E8', 'EB', 'F7', 'F8', 'H7', 'H8', 
+    'HK', 'HL', 'I7', 'I8', 'SE'
+    })
+
+# Rate buckets of saldo_to_mes. Intervals are closed on the right, as pd.cut:
+RANGOS_TASA = np.array([-np.inf, 0, 1, 11, 21, 24, 26, 26.5, 27, 27.5, 28, 29, 
+                        30, np.inf])
+GRUPOS_TASA = np.array([
+    'a. 0%', 'b. 0.1% - 0.9%', 'c. 1% - 10.9%', 'd. 11% - 20.9%', 
+    'e. 21% - 23.9%', 'f. 24% - 25.9%', 'g. 26% - 26.4%', 'h. 26.5% - 26.9%', 
+    'i. 27% - 27.4%', 'j. 27.5% - 27.9%', 'k. 28% - 28.9%', 'l. 29% - 29.9%', 
+    'm. >30%'
+    ], dtype=object)
+
+#--------------------------------- Functions ----------------------------------
+def _sumas_segmento_numpy(saldo: np.ndarray, es_compraCartera: np.ndarray,
+                          es_totalero: np.ndarray, es_compra: np.ndarray,
+                          es_avance: np.ndarray)-> np.ndarray:
+    """Sums the balance of each segment used by segmentacion_saldo.
+
+    Args:
+        saldo (np.ndarray): balance of each transaction.
+        es_compraCartera (np.ndarray): mask of portfolio purchases.
+        es_totalero (np.ndarray): mask of single-installment transactions.
+        es_compra (np.ndarray): mask of purchases.
+        es_avance (np.ndarray): mask of cash advances.
+
+    Returns:
+        np.ndarray: balances of [compra de cartera, totaleros, compras,
+            avances]. Totaleros exclude portfolio purchases, and
+            purchases and advances exclude both previous segments.
+    """
+    resto = ~es_compraCartera & ~es_totalero
+    return np.array([
+        np.nansum(saldo[es_compraCartera]),
+        np.nansum(saldo[~es_compraCartera & es_totalero]),
+        np.nansum(saldo[resto & es_compra]),
+        np.nansum(saldo[resto & es_avance]),
+        ])
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _sumas_segmento(saldo, es_compraCartera, es_totalero, es_compra,
+                        es_avance):
+        """Single-pass numba version of _sumas_segmento_numpy."""
+        compraCartera = 0.0
+        totaleros = 0.0
+        compras = 0.0
+        avances = 0.0
+        for i in prange(saldo.shape[0]):
+            valor = saldo[i]
+            if not np.isnan(valor):
+                if es_compraCartera[i]:
+                    compraCartera += valor
+                elif es_totalero[i]:
+                    totaleros += valor
+                elif es_compra[i]:
+                    compras += valor
+                elif es_avance[i]:
+                    avances += valor
+        return np.array([compraCartera, totaleros, compras, avances])
+else:
+    _sumas_segmento = _sumas_segmento_numpy
+
+def _impacto_numpy(saldo: np.ndarray, tasa_ea: np.ndarray,
+                   interes_ea: np.ndarray, usura: float, usura_final: float
+                   )-> tuple:
+    """Exposed balance and P&L impact of a rise of the usury rate from
+    usura to usura_final. Transactions whose original rate is above the
+    current usury rate are exposed, and their rate moves to the lower
+    of the original rate and the new usury rate.
+
+    Args:
+        saldo (np.ndarray): balance of each transaction.
+        tasa_ea (np.ndarray): original effective annual rate.
+        interes_ea (np.ndarray): current effective annual rate.
+        usura (float): current usury rate.
+        usura_final (float): usury rate after the rise.
+
+    Returns:
+        tuple: exposed balance and P&L impact.
+    """
+    expuesto = tasa_ea > usura
+    saldo_exp = saldo[expuesto]
+    tasa_final = np.minimum(tasa_ea[expuesto], usura_final)
+    impacto = saldo_exp * (tasa_final - interes_ea[expuesto]) / 100
+    return np.nansum(saldo_exp), np.nansum(impacto)
+
+if njit is not None:
+    # Sin parallel=True: las secciones que lo usan corren en hilos
+    # simultáneos y la capa de hilos workqueue de numba no admite llamadas
+    # paralelas concurrentes
+    @njit(cache=True)
+    def _impacto(saldo, tasa_ea, interes_ea, usura, usura_final):
+        """Single-pass numba version of _impacto_numpy."""
+        saldo_exp = 0.0
+        impacto = 0.0
+        for i in range(saldo.shape[0]):
+            if tasa_ea[i] > usura:
+                valor = saldo[i]
+                if not np.isnan(valor):
+                    saldo_exp += valor
+                tasa_final = min(tasa_ea[i], usura_final)
+                variacion = valor * (tasa_final - interes_ea[i]) / 100
+                if not np.isnan(variacion):
+                    impacto += variacion
+        return saldo_exp, impacto
+else:
+    _impacto = _impacto_numpy
+
+def _rango_tasa(tasas: Union[np.ndarray, pd.Series])-> np.ndarray:
+    """Assigns the GRUPOS_TASA label of each rate, like pd.cut over
+    RANGOS_TASA but with a binary search on the raw array.
+
+    Args:
+        tasas (Union[np.ndarray, pd.Series]): effective annual rates in
+            percentage.
+
+    Returns:
+        np.ndarray: object array with the label of each rate, None where
+            the rate is missing.
+    """
+    tasas = np.asarray(tasas, dtype=np.float64)
+    idx = np.searchsorted(RANGOS_TASA, tasas, side='left') - 1
+    rangos = GRUPOS_TASA[np.clip(idx, 0, len(GRUPOS_TASA)-1)]
+    rangos[np.isnan(tasas)] = None
+    return rangos
+
 #---------------------------------- Classes -----------------------------------
 
 class ProcesamientoTC(object): 
@@ -64,68 +243,66 @@ class ProcesamientoTC(object):
         saldo_otros = []
         periodo = []
         
+        # Only the typed columns are parsed; the rest are skipped by fread:
         columns = [
-            'nro_producto', 'nro_producto_cifrado', 'tipo_producto', 
-            'nro_identificacion','tipo_identificacion', 'codigo_producto', 
-            'franquicia', 'clase_cartera', 'cupo_aprobado', 'cupo_disponible', 
-            'saldo_capital', 'saldo_capital_empleados', 'saldo_int_cte_activo', 
-            'saldo_int_mora', 'saldo_seguros', 'saldo_productivo_cuota_manejo', 
-            'saldo_improduct_cuota_manejo', 'saldo_compras', 'compras_mes', 
-            'saldo_avances', 'valor_avances_mes', 'saldo_capital_mora', 
-            'saldo_otros_cargos', 'saldo_a_favor', 'saldo_capital_usd', 
-            'saldo_int_ctes_usd', 'saldo_int_mora_usd', 'saldo_a_favor_dolar', 
-            'saldo_total_corte', 'periodo'
+            (c, COMP_SALDO_DTYPES[c]) if c in COMP_SALDO_DTYPES else None
+            for c in COMP_SALDO_COLUMNS
+            ]
+        df_mes = dt.fread(self.comp_saldo_path, columns=columns).to_pandas()
+        
+        # Sum every column needed for the composition in a single pass:
+        sum_columns = [
+            'saldo_capital', 'saldo_capital_mora', 'saldo_avances', 
+            'saldo_compras', 'saldo_a_favor', 'saldo_a_favor_dolar', 
+            'saldo_capital_usd', 'saldo_improduct_cuota_manejo', 
+            'saldo_int_ctes_usd', 'saldo_int_cte_activo', 'saldo_int_mora', 
+            'saldo_int_mora_usd', 'saldo_otros_cargos', 
+            'saldo_productivo_cuota_manejo', 'saldo_seguros'
             ]
+        sums = df_mes[sum_columns].to_numpy(dtype=np.float64).sum(axis=0)
+        s = dict(zip(sum_columns, sums))
 
-        df_mes = dt.fread(self.comp_saldo_path).to_pandas()
-        df_mes.columns = columns
-        df_mes = reduce_memory_usage(df_mes)
-        
         #saldo total
-        saldo_total = (
-            df_mes.saldo_capital.values.sum() -
-            df_mes.saldo_capital_mora.values.sum() 
-            )
+        saldo_total = s['saldo_capital'] - s['saldo_capital_mora']
         saldo_mensual_total.append(saldo_total)
     
         
         #saldo capital
         saldo_k = (
-            df_mes['saldo_avances'].values.sum() 
-            + df_mes['saldo_compras'].values.sum() 
-            - df_mes['saldo_capital_mora'].values.sum() 
-            + df_mes['saldo_a_favor'].values.sum()
-            + df_mes['saldo_a_favor_dolar'].values.sum()
-            + df_mes['saldo_capital_usd'].values.sum() 
-            + df_mes['saldo_improduct_cuota_manejo'].values.sum()
+            s['saldo_avances'] 
+            + s['saldo_compras'] 
+            - s['saldo_capital_mora'] 
+            + s['saldo_a_favor']
+            + s['saldo_a_favor_dolar']
+            + s['saldo_capital_usd'] 
+            + s['saldo_improduct_cuota_manejo']
             )
             
         saldo_capital.append(saldo_k)
         
         #saldo interes
         saldo_intereses = (
-            df_mes['saldo_int_ctes_usd'].values.sum() 
-            + df_mes['saldo_int_cte_activo'].values.sum() 
-            + df_mes['saldo_int_mora'].values.sum() 
-            + df_mes['saldo_int_mora_usd'].values.sum()
+            s['saldo_int_ctes_usd'] 
+            + s['saldo_int_cte_activo'] 
+            + s['saldo_int_mora'] 
+            + s['saldo_int_mora_usd']
             )
         saldo_interes.append(saldo_intereses)
         
         #saldo mora
-        saldo_mora_1 = df_mes.saldo_capital_mora.values.sum()
+        saldo_mora_1 = s['saldo_capital_mora']
         saldo_mora.append(saldo_mora_1)
         
         #saldo otros
         saldo_otros_1 = (
-            df_mes.saldo_otros_cargos.values.sum() 
-            + df_mes.saldo_productivo_cuota_manejo.values.sum() 
-            + df_mes.saldo_seguros.values.sum()
+            s['saldo_otros_cargos'] 
+            + s['saldo_productivo_cuota_manejo'] 
+            + s['saldo_seguros']
             )
         saldo_otros.append(saldo_otros_1)
         
         # periodos
-        num_periodo = df_mes.periodo.unique()
-        nombre_periodo = num_periodo[0]
+        nombre_periodo = df_mes['periodo'].iat[0]
         periodo.append(nombre_periodo)
         
         df_composicion_saldo = pd.DataFrame({
@@ -144,27 +321,19 @@ class ProcesamientoTC(object):
         df = self.sql.query_comp_balance(last_month_date).set_index('periodo')
         
         # Validate that the columns are the same and in the same order:
-        assert not all(
-            [df_composicion_saldo.columns[i]==df.columns[i] for i
-            in range(len(df_composicion_saldo.columns))]
-            ), "Column names don't correspond with historical data"
-
-        monthly_var_df = df_composicion_saldo/df.values-1
-        monthly_var_df.columns = ['var_'+i for i in monthly_var_df.columns]
-
-        df_composicion_saldo = df_composicion_saldo.merge(
-            monthly_var_df,
-            left_index = True,
-            right_index = True
-            )
+        assert df_composicion_saldo.columns.equals(df.columns), \
+            "Column names don't correspond with historical data"
 
-        df.columns = ['objetivos_de_destino_'+i for i in df.columns]
-        df.index = df_composicion_saldo.index
-
-        df_composicion_saldo = df_composicion_saldo.merge(
-            df, 
-            left_index = True,
-            right_index  =True
+        # Current balances, monthly variation and previous month's balances
+        # (objetivos de destino) in one wide row:
+        columns = df_composicion_saldo.columns
+        current = df_composicion_saldo.to_numpy(dtype=np.float64)
+        previous = df.to_numpy(dtype=np.float64)
+        df_composicion_saldo = pd.DataFrame(
+            np.hstack([current, current/previous-1, previous]),
+            index=df_composicion_saldo.index,
+            columns=(list(columns) + ['var_'+i for i in columns]
+                     + ['objetivos_de_destino_'+i for i in columns])
             ).reset_index()
         df_composicion_saldo.to_sql('composicion_saldo_adg', 
                                     con=self.sql.engine, index=False,
@@ -176,7 +345,7 @@ class ProcesamientoTC(object):
         
     ''' SECCIÓN 2 '''
     
-    def procesar(archivo, nombre_mes):
+    def procesar(self, archivo, nombre_mes):
         # start_time = pd.Timestamp('now') 
             #Selección de columnas
         sel_columnas = ['nro_producto', 'nro_producto_cifrado', 'fecha_transaccion', 'nro_comprobante_transaccion', 'tipo_transaccion', 'cod_transaccion', 'nro_primera_facturacion', 'fecha_primera_facturacion', 'fecha_aplicacion', 'fecha_liquidacion_interes', 'fecha_deposito', 'nro_referencia_universal', 'cod_comercio', 'tipo_comercio', 'tasa_interes', 'modalidad_interes', 'porcentaje_comision_credito', 'valor_transaccion', 'valor_primera_cuota', 'nro_cargos_diferidos', 'valor_propina', 'saldo_actual_trasaccion', 'cuotas_por_facturar', 'valor_act_cuotas_por_facturar', 'valor_ult_cuota', 'estado_transaccion', 'nro_autorizacion', 'fecha_ultimo_pago','nro_interno_puc', 'saldo_ultima_facturacion', 'ultima_cuota_facturada', 'nro_cuotas_por_facturar', 'nro_ultima_facturacion', 'fecha_reversion', 'modalidad_credito', 'valor_cambio', 'valor_tarifa', 'oficina_establecimiento', 'cod_origen_movimiento', 'tipo_producto', 'cod_linea_diferida', 'cod_motivo', 'manejo_periodo_gracia', 'nro_facturacion_transaccion', 'campo_temporal_txt', 'intereses_provisionales_transaccion', 'valor_iva', 'interes_facturado', 'cantidad_cuotas_factura', 'saldo_interes_acumulado', 'plan_pagos_especial', 'plan_amortizacion', 'tasa_interes_plan_pagos', 'nro_tasa_interes', 'cuotas_extra_calendarizadas', 'val_cuotas_extra_calendarizadas', 'cantidad_cuotas_estraordinarias', 'frecuencia_cuotas_extraordinarias', 'dias_periodo_gracia', 'periodo', 'tasa_interes_1']
@@ -185,101 +354,67 @@ class ProcesamientoTC(object):
         usecols = ['nro_producto','fecha_transaccion','tipo_transaccion','cod_transaccion', 'tasa_interes_1', 'valor_transaccion', 'nro_cargos_diferidos','saldo_actual_trasaccion', 'tipo_producto','periodo']
             
         # Especificación del tipo de dato para producto
-        dtype = {"nro_producto":str,"nro_producto_cifrado":str}
-        size = 500000
-            
-        # Lectura a trozos del dataframe
-        df_chunk = pd.read_csv(archivo, sep=';', names=sel_columnas, dtype=dtype, header=None, usecols=usecols,chunksize=size,
-                                  low_memory=False)
+        dtype = {"nro_producto":dt.str32}
             
-        # Iteración sobre cada trozo y guardarlo en una lista de df
-        chunk_list = []
-        for chunk in df_chunk:
-            chunk_list.append(chunk)
-            
-            # Unión de todos los df
-        df = pd.concat(chunk_list)
+        # Lectura del archivo en un solo paso, omitiendo las columnas que no
+        # están en usecols
+        columnas_fread = [
+            (c, dtype[c]) if c in dtype else (c if c in usecols else None)
+            for c in sel_columnas
+            ]
+        df = dt.fread(archivo, sep=';', header=False, 
+                      columns=columnas_fread).to_pandas()
             
-        df_1 = df[usecols]
-        df_2 = df_1.rename(columns={"tasa_interes_1":"tasa_interes"})
+        df.rename(columns={"tasa_interes_1":"tasa_interes"}, inplace=True)
             
         # print(f'{nombre_mes} completo')
-        df_3 = df_2[df_2['tipo_transaccion'].isin([1,2,'1','2','C','V'])]
+        df = df.loc[df['tipo_transaccion'].isin(TIPOS_TRANSACCION)]
         # print(f'{nombre_mes} con tipo de transacción')
                 
-        # Comprobar si hay datos que impidan transformar los tipos de datos:
-        # Cargos diferidos
-        if df_3.iloc[-1:,10:11].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]
-        # cuotas_por_facturar    
-        if df_3.iloc[-1:,12:13].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]
-        # estado_transaccion    
-        if df_3.iloc[-1:,15:16].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]
-        # nro_cuotas_por_facturar    
-        if df_3.iloc[-1:,16:17].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]
-        # nro_ultima_facturacion    
-        if df_3.iloc[-1:,17:18].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]
-        # periodo     
-        if df_3.iloc[-1:,19:20].isna().values == True:
-            df_3 = df_3.iloc[:-1,:]  
+        # Comprobar si hay datos que impidan transformar los tipos de datos
+        # (fila final del archivo incompleta):
+        columnas_validacion = ['nro_cargos_diferidos', 'periodo']
+        if df[columnas_validacion].iloc[-1].isna().any():
+            df = df.iloc[:-1]
             
-        # Transformar los tipos de datos para cargarlos a SQL Server
-        
-        df_3.nro_producto = df_3.nro_producto.astype('str')
-        df_3.fecha_transaccion = df_3.fecha_transaccion.astype('str')
-        df_3.tipo_transaccion = df_3.tipo_transaccion.astype('str')
-        df_3.cod_transaccion = df_3.cod_transaccion.astype('str')
-        # df_3.fecha_primera_facturacion = df_3.fecha_primera_facturacion.astype('str')        
-        # df_3.fecha_liquidacion_interes = df_3.fecha_liquidacion_interes.astype('str')
-        df_3.tasa_interes = df_3.tasa_interes.astype('str')
-        # df_3.modalidad_interes = df_3.modalidad_interes.astype('str')
-        df_3.valor_transaccion = df_3.valor_transaccion.astype('str')
-        # df_3.valor_primera_cuota = df_3.valor_primera_cuota.astype('str')
-        df_3.nro_cargos_diferidos = df_3.nro_cargos_diferidos.astype('str')        
-        df_3.saldo_actual_trasaccion = df_3.saldo_actual_trasaccion.astype('str')
-        # df_3.cuotas_por_facturar = df_3.cuotas_por_facturar.astype('str')
-        # df_3.valor_act_cuotas_por_facturar = df_3.valor_act_cuotas_por_facturar.astype('str')
-        # df_3.valor_ult_cuota = df_3.valor_ult_cuota.astype('str')
-        # df_3.estado_transaccion = df_3.estado_transaccion.astype('str')
-        # df_3.nro_cuotas_por_facturar = df_3.nro_cuotas_por_facturar.astype('str')        
-        # df_3.nro_ultima_facturacion = df_3.nro_ultima_facturacion.astype('str')
-        df_3.tipo_producto = df_3.tipo_producto.astype('str')
-        df_3.periodo = pd.to_datetime(df_3.periodo, format='%Y%m%d')
-
+        # Transformar los tipos de datos para cargarlos a SQL Server. Los
+        # códigos de transacción (valores mixtos numéricos y alfanuméricos) y
+        # las llaves del cruce con Maestro_Facturacion en tasas_originales se
+        # convierten a texto, para que el cruce siga comparando el mismo texto
+        # de siempre; tasas y saldos conservan su tipo y se mapean con
+        # sql_dtypes en to_sql
+        columnas_texto = ['nro_producto', 'fecha_transaccion', 'tipo_transaccion', 'cod_transaccion',
+                          'valor_transaccion', 'nro_cargos_diferidos', 'tipo_producto']
+        df[columnas_texto] = df[columnas_texto].astype('str')
 
         # print(f'Transformación de datos completa para: {nombre_mes}')
             
-        df_3 = df_3.reset_index()
-        df_3 = df_3.rename(columns={'index':'llave'})
-        periodo_1 = df_3.iloc[0][10]
-        # periodo_1 = periodo_1[0] 
+        df.reset_index(inplace=True)
+        df.rename(columns={'index':'llave'}, inplace=True)
+        periodo_1 = pd.to_datetime(str(int(df['periodo'].iloc[0])), format='%Y%m%d')
         periodo_1 = periodo_1.strftime("%Y-%m-%d")
-        df_3 = df_3[['llave','nro_producto','fecha_transaccion','tipo_transaccion','cod_transaccion', 'tasa_interes', 'valor_transaccion', 'nro_cargos_diferidos',
-                     'saldo_actual_trasaccion', 'tipo_producto','periodo']]
-        df_3.llave = df_3.llave.astype('str')
-        df_3['periodo'] = periodo_1    
-        df_3.periodo = df_3.periodo.astype('str')
-        
-        
-        import sqlalchemy
-        import urllib
-        
-        
-        params = urllib.parse.quote_plus("DRIVER={SQL Server Native Client 11.0};"
-                                         "SERVER=SADGVSQL2K19U\DREP,57201;"
-                                         "DATABASE=SieT;"
-                                         "Trusted_Connection=yes;")
-        
-        
-        engine = sqlalchemy.create_engine("mssql+pyodbc:///?odbc_connect={}".format(params))
+        df['periodo'] = periodo_1    
+        
+        sql_dtypes = {
+            'llave': sqlalchemy.types.BigInteger,
+            'nro_producto': sqlalchemy.types.String(50),
+            'fecha_transaccion': sqlalchemy.types.String(50),
+            'tipo_transaccion': sqlalchemy.types.String(50),
+            'cod_transaccion': sqlalchemy.types.String(50),
+            'tasa_interes': sqlalchemy.types.Float,
+            'valor_transaccion': sqlalchemy.types.String(50),
+            'nro_cargos_diferidos': sqlalchemy.types.String(50),
+            'saldo_actual_trasaccion': sqlalchemy.types.Float,
+            'tipo_producto': sqlalchemy.types.String(50),
+            'periodo': sqlalchemy.types.Date,
+            }
+        # Orden final de las columnas de la tabla del mes
+        df = df[list(sql_dtypes)]
         
         
         inicio = pd.Timestamp('now')
-        df_3.to_sql(f'{nombre_mes}', con=engine, if_exists='replace', index=False, chunksize=500000)
+        df.to_sql(f'{nombre_mes}', con=self.sql.engine, if_exists='replace', index=False, chunksize=10000,
+                    dtype=sql_dtypes)
         print(pd.Timestamp('now')-inicio)
             
         '''
@@ -333,12 +468,17 @@ class ProcesamientoTC(object):
                             "Trusted_Connection=yes;")            
 
         cursor = con.cursor()
+        cursor.fast_executemany = True
 
-        for index, row in df_3.iterrows():
-            query_insert = """INSERT INTO %s ("llave","nro_producto", "fecha_transaccion", "tipo_transaccion","cod_transaccion", "fecha_primera_facturacion","fecha_liquidacion_interes", "tasa_interes", "modalidad_interes","valor_transaccion", "valor_primera_cuota", "nro_cargos_diferidos","saldo_actual_trasaccion", "cuotas_por_facturar","valor_act_cuotas_por_facturar", "valor_ult_cuota","estado_transaccion", "nro_cuotas_por_facturar","nro_ultima_facturacion", "tipo_producto", "periodo") 
-                                       VALUES (?,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) 
-                                       """% (nombre_mes)
-            cursor.execute(query_insert, [row.llave, row.nro_producto , row.fecha_transaccion, row.tipo_transaccion, row.cod_transaccion, row.fecha_primera_facturacion, row.fecha_liquidacion_interes, row.tasa_interes, row.modalidad_interes, row.valor_transaccion, row.valor_primera_cuota, row.nro_cargos_diferidos, row.saldo_actual_trasaccion, row.cuotas_por_facturar, row.valor_act_cuotas_por_facturar, row.valor_ult_cuota, row.estado_transaccion, row.nro_cuotas_por_facturar, row.nro_ultima_facturacion, row.tipo_producto, row.periodo])
+        query_insert = """INSERT INTO %s ("llave","nro_producto", "fecha_transaccion", "tipo_transaccion","cod_transaccion", "fecha_primera_facturacion","fecha_liquidacion_interes", "tasa_interes", "modalidad_interes","valor_transaccion", "valor_primera_cuota", "nro_cargos_diferidos","saldo_actual_trasaccion", "cuotas_por_facturar","valor_act_cuotas_por_facturar", "valor_ult_cuota","estado_transaccion", "nro_cuotas_por_facturar","nro_ultima_facturacion", "tipo_producto", "periodo") 
+                                   VALUES (?,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) 
+                                   """% (nombre_mes)
+        columnas_insert = ['llave', 'nro_producto', 'fecha_transaccion', 'tipo_transaccion', 'cod_transaccion', 'fecha_primera_facturacion', 'fecha_liquidacion_interes', 'tasa_interes', 'modalidad_interes', 'valor_transaccion', 'valor_primera_cuota', 'nro_cargos_diferidos', 'saldo_actual_trasaccion', 'cuotas_por_facturar', 'valor_act_cuotas_por_facturar', 'valor_ult_cuota', 'estado_transaccion', 'nro_cuotas_por_facturar', 'nro_ultima_facturacion', 'tipo_producto', 'periodo']
+        df_insert = df[columnas_insert]
+        size = 50000
+        for inicio_lote in range(0, len(df_insert), size):
+            lote = df_insert.iloc[inicio_lote:inicio_lote+size]
+            cursor.executemany(query_insert, list(lote.itertuples(index=False, name=None)))
     
         con.commit()
         # print(cursor.rowcount, "Registros insertados satisfactoriamente en SieT..composicion_saldo")
@@ -347,47 +487,32 @@ class ProcesamientoTC(object):
         # print(f'Tiempo de procesamiento para el archivo {archivo} fue de ',elapsed_time)
         '''       
         
-        import pyodbc as sql   
-        '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
-
+        con = self.sql.pyodbc_conn
         cursor = con.cursor()
         
-        df_4 = df_3[['periodo']]
-        df_4 = df_4.iloc[0][0]
-
+        # Solo se inserta el periodo si no está ya en el calendario
         query_insert = """INSERT INTO Calendario_DTC
                             ("periodo") 
-                            VALUES (?) """
+                            SELECT ?
+                            WHERE NOT EXISTS (
+                                SELECT 1 FROM Calendario_DTC WHERE periodo = ?
+                                ) """
                             
-        cursor.execute(query_insert, df_4)
+        cursor.execute(query_insert, periodo_1, periodo_1)
     
         con.commit()
         cursor.close()
         
         del df
-        del df_1
-        del df_2
-        del df_3
 
 
         
         
     '''SECCIÓN 3'''
     
-    def tasas_originales(mes_base,num_mes,num_anio):
+    def tasas_originales(self, mes_base, num_mes, num_anio):
         
-        import pyodbc as sql
-        con = sql.connect(
-            "DRIVER={SQL Server Native Client 11.0};"
-            "SERVER=SADGVSQL2K19U\DREP,57201;"
-            "Trusted_Connection=yes;"
-        )
-    
+        con = self.sql.pyodbc_conn
         cursor = con.cursor()
         
         anio_final = num_anio - 10        
@@ -395,113 +520,71 @@ class ProcesamientoTC(object):
         numero_mes = num_mes
         numero_anio = num_anio
     
-        df_complete_1 = []   
+        # Meses de facturación a escanear, del más reciente al más antiguo
+        fechas = []
         while numero_mes >= 1 and numero_anio >= anio_final:     
             for i in range(0,num_mes):
-    
-                sql_1 = ''' 
-                        SELECT p1.llave, p2.FECHA, p1.nro_producto, p2.NEGOCIO, p1.fecha_transaccion, p1.tipo_transaccion, p1.cod_transaccion, p1.nro_cargos_diferidos, 
-                        p1.tasa_interes, p1.valor_transaccion, p1.saldo_actual_trasaccion, p1.tipo_producto,
-                        p2.IDENTIFICACION, P1.periodo,
-                        CASE CAST(p1.nro_cargos_diferidos AS FLOAT)
-                            WHEN 1 THEN 0
-                            ELSE p2.TASA_EA
-                            END as TASA_EA   
-                    
-                    FROM SieT..[%s] AS p1
-                
-                    INNER JOIN Maestro_Saldos..Maestro_Facturacion AS p2
-                    
-                    ON p1.[nro_producto] = p2.NEGOCIO 
-                    AND P1.[valor_transaccion] = p2.VALOR_TRANSACCION
-                    AND p1.[nro_cargos_diferidos] = p2.CUOTAS_DIFERIDAS
-                    AND p2.CODIGO_TRANSACCION = p1.cod_transaccion 
-                    AND p2.CODIGO_PRODUCTO = p1.tipo_producto
-                    AND p1.[fecha_transaccion] = p2.FECHA_TRANSACCION
-                    WHERE p2.FECHA = '%s-%s-01'
-                    ; '''% (mes_base, numero_anio, numero_mes)
-                print(mes_base, numero_anio, numero_mes)
-                
-                df_1 = pd.read_sql_query(sql_1, con = con)
-                
-                df_complete_1.append(df_1)
-                
-                # print(f'Escaneo mes para tasas originales en mes {numero_mes} y año {numero_anio} completo')
+                fechas.append(datetime.date(numero_anio, numero_mes, 1))
                 
                 numero_mes = numero_mes - 1
                 
                 if numero_mes == 0:
                     numero_anio = numero_anio - 1
                     numero_mes = 12
-                    
+        print(mes_base, fechas[-1], fechas[0])
+    
+        # Una sola consulta para todos los meses en lugar de una por mes. El
+        # cruce con el mes base se hace en SQL Server; cuando no se encuentra
+        # la tasa original se usa la tasa de interés del mes en E.A. Si una
+        # transacción cruza con varios meses de facturación se conserva la del
+        # mes más reciente (rn = 1)
+        sql_1 = ''' 
+                SELECT m.llave, m.nro_producto, m.fecha_transaccion, m.tipo_transaccion, m.cod_transaccion, 
+                m.tasa_interes,
+                COALESCE(t.TASA_EA, ROUND((POWER(m.tasa_interes/100.0+1, 12)-1)*100, 2)) as TASA_EA,
+                m.valor_transaccion, m.nro_cargos_diferidos, m.saldo_actual_trasaccion, m.tipo_producto, m.periodo
+            
+            FROM SieT..[%s] AS m
+            
+            LEFT JOIN (
+                SELECT p1.llave,
+                ROW_NUMBER() OVER (PARTITION BY p1.llave ORDER BY p2.FECHA DESC) as rn,
+                CASE CAST(p1.nro_cargos_diferidos AS FLOAT)
+                    WHEN 1 THEN 0
+                    ELSE p2.TASA_EA
+                    END as TASA_EA   
+            
+                FROM SieT..[%s] AS p1
         
-        df_complete = pd.concat(df_complete_1)
+                INNER JOIN Maestro_Saldos..Maestro_Facturacion AS p2
+            
+                ON p1.[nro_producto] = p2.NEGOCIO 
+                AND P1.[valor_transaccion] = p2.VALOR_TRANSACCION
+                AND p1.[nro_cargos_diferidos] = p2.CUOTAS_DIFERIDAS
+                AND p2.CODIGO_TRANSACCION = p1.cod_transaccion 
+                AND p2.CODIGO_PRODUCTO = p1.tipo_producto
+                AND p1.[fecha_transaccion] = p2.FECHA_TRANSACCION
+                WHERE p2.FECHA IN (%s)
+                ) AS t
+            
+            ON m.llave = t.llave
+            AND t.rn = 1
+            ; '''% (mes_base, mes_base, ', '.join('?' * len(fechas)))
+        
+        cruce_mes_left = pd.read_sql_query(sql_1, con = con, params=fechas)
+        cursor.close()
         # print(f'1/3 Escaneo de tasas originales completo para {mes_base}')
         # print('* ' * 25)    
 
-        df_complete.nro_cargos_diferidos = df_complete.nro_cargos_diferidos.astype('float')
-        df_complete.tipo_transaccion = df_complete.tipo_transaccion.astype('float')
-        # df_complete.nro_cuotas_por_facturar = df_complete.nro_cuotas_por_facturar.astype('int')
-        df_complete.tasa_interes = df_complete.tasa_interes.astype('float')
-        df_complete.TASA_EA = df_complete.TASA_EA.astype('float')
-        df_complete.valor_transaccion = df_complete.valor_transaccion.astype('float')
-        df_complete.saldo_actual_trasaccion = df_complete.saldo_actual_trasaccion.astype('float')
-        # df_complete.valor_ult_cuota = df_complete.valor_ult_cuota.astype('float')
-        # df_complete.estado_transaccion = df_complete.estado_transaccion.astype('int')
-        # df_complete.nro_ultima_facturacion = df_complete.nro_ultima_facturacion.astype('int')
-        # df_complete.periodo = pd.to_datetime(df_complete.periodo, format='%Y%m%d')
+        cruce_mes_left.nro_cargos_diferidos = cruce_mes_left.nro_cargos_diferidos.astype('float')
+        cruce_mes_left.tasa_interes = cruce_mes_left.tasa_interes.astype('float')
+        cruce_mes_left.TASA_EA = cruce_mes_left.TASA_EA.astype('float')
+        cruce_mes_left.valor_transaccion = cruce_mes_left.valor_transaccion.astype('float')
+        cruce_mes_left.saldo_actual_trasaccion = cruce_mes_left.saldo_actual_trasaccion.astype('float')
         
         # print('2/3 Tipos de datos modificados satisfactoriamente')
         # print('* ' * 25)
         
-    
-        # return df_complete
-        import pyodbc as sql
-        con = sql.connect(
-            "DRIVER={SQL Server Native Client 11.0};"
-            "SERVER=SADGVSQL2K19U\DREP,57201;"
-            "Trusted_Connection=yes;"
-        )
-    
-        cursor = con.cursor()
-        
-        sql_1 = ''' SELECT *                    
-                    FROM SieT..[%s]; '''% (mes_base)
-                
-        df_mes_ta = pd.read_sql_query(sql_1, con = con)  
-        con.commit()
-        cursor.close()     
-
-        df_mes_ta.nro_cargos_diferidos = df_mes_ta.nro_cargos_diferidos.astype('float')
-        # df_mes_ta.nro_cuotas_por_facturar = df_mes_ta.nro_cuotas_por_facturar.astype('int')
-        df_mes_ta.tasa_interes = df_mes_ta.tasa_interes.astype('float')        
-        df_mes_ta.valor_transaccion = df_mes_ta.valor_transaccion.astype('float')
-        df_mes_ta.saldo_actual_trasaccion = df_mes_ta.saldo_actual_trasaccion.astype('float')
-        # df_mes_ta.valor_ult_cuota = df_mes_ta.valor_ult_cuota.astype('float')
-        # df_mes_ta.estado_transaccion = df_mes_ta.estado_transaccion.astype('int')
-        # df_mes_ta.nro_ultima_facturacion = df_mes_ta.nro_ultima_facturacion.astype('int')
-        # df_mes_ta.periodo = pd.to_datetime(df_mes_ta.periodo, format='%Y%m%d')
-        
-        
-        df_mes_to = df_complete
-        
-        df_mes_to_sinDuplicados = df_mes_to.drop_duplicates(subset=['llave'])
-        
-        cruce_mes_left = pd.merge(df_mes_ta, df_mes_to_sinDuplicados, how='left', on='llave', indicator=True, validate=('1:1'))
-        
-        missing = cruce_mes_left[cruce_mes_left['TASA_EA'].isna()]
-        complete = cruce_mes_left[~cruce_mes_left['FECHA'].isna()]
-        missing['TASA_EA'] = missing['tasa_interes_x'].apply(lambda x: round((((((x/100)+1)**12)-1)*100),2)) 
-        
-        cruce_mes_left = pd.concat([complete, missing])
-
-        columnas=  ['llave', 'nro_producto_x', 'fecha_transaccion_x', 'tipo_transaccion_x','cod_transaccion_x', 'tasa_interes_x',  'TASA_EA', 'valor_transaccion_x', 'nro_cargos_diferidos_x',
-                    'saldo_actual_trasaccion_x', 'tipo_producto_x', 'periodo_x']
-        cruce_mes_left = cruce_mes_left[columnas]
-        
-        cruce_mes_left = cruce_mes_left.rename(columns={'nro_producto_x':'nro_producto', 'fecha_transaccion_x':'fecha_transaccion', 'tipo_transaccion_x':'tipo_transaccion', 'cod_transaccion_x':'cod_transaccion',
-                                                        'tasa_interes_x':'tasa_interes',   'valor_transaccion_x':'valor_transaccion','nro_cargos_diferidos_x':'nro_cargos_diferidos', 
-                                                        'saldo_actual_trasaccion_x':'saldo_actual_trasaccion', 'tipo_producto_x':'tipo_producto', 'periodo_x':'periodo'})
         cruce_mes_left.TASA_EA = cruce_mes_left.TASA_EA.round(1)
                 
         # print('Resultado: ',cruce_mes_left.saldo_actual_trasaccion.sum())
@@ -515,7 +598,7 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 4 '''
     
-    def segmentacion_saldo(df):
+    def segmentacion_saldo(self, df):
         '''
         Lee un mes de transacciones específico y calcula el saldo para cada tipo de transacción, sea esta compra de cartera, 
         totaleros, compras y avances.
@@ -524,90 +607,58 @@ class ProcesamientoTC(object):
         # print('Ejecutando la segmentación de saldo. Espere un momento...')
         # Cargue de los datos
         df_mes_input = df
-        df_mes_input['interes_ea'] = (((((df_mes_input['tasa_interes']/100)+1)**12)-1)*100).round(2)
-    
-    
-        #Compra de cartera
-        saldo_compraCartera_1 = []
-        compraCartera_mes = df_mes_input[df_mes_input['cod_transaccion'].isin(['0I','1C','1D','4I','6H','6I','6K','6L','6V','7A','7B','9Q','9S','A0','AW','BW','D0','DU','E8','EB','F7','F8','H7','H8','HK','HL','I7','I8','SE'])]
-        compraCartera = compraCartera_mes.reset_index(drop=True)
-        saldo_compraCartera = compraCartera.saldo_actual_trasaccion.sum()
-        saldo_compraCartera_1.append(saldo_compraCartera)
-    
-        # Filtrando la base, quitando los de compra de cartera
-        df_mes_1 = df_mes_input[~df_mes_input['cod_transaccion'].isin(['0I','1C','1D','4I','6H','6I','6K','6L','6V','7A','7B','9Q','9S','A0','AW','BW','D0','DU','E8','EB','F7','F8','H7','H8','HK','HL','I7','I8','SE'])]
-        df_mes_1 = df_mes_1.reset_index(drop=True)
     
-        # Identificación de totaleros
-        saldo_totaleros_1 = []
-        totaleros = df_mes_1[df_mes_1['nro_cargos_diferidos'].isin([1])]
-        saldo_totaleros = totaleros.saldo_actual_trasaccion.sum()
-        saldo_totaleros_1.append(saldo_totaleros)
     
-        # filtrando la base para quitar los totaleros
-        df_mes_2 = df_mes_1[~df_mes_1['nro_cargos_diferidos'].isin([1])]
-    
-        # Identificación de compras
-        saldo_compras_1 = []
-        compras_mes = df_mes_2[df_mes_2['tipo_transaccion'].isin([1,'1', 'C'])]
-        compras_mes = compras_mes.reset_index(drop=True)
-        saldo_compras = compras_mes.saldo_actual_trasaccion.sum()
-        saldo_compras_1.append(saldo_compras)
-    
-        # Identificación de avances
-        saldo_avances_1 = []
-        avances_mes = df_mes_2[df_mes_2['tipo_transaccion'].isin([2, '2', 'V'])]
-        avances_mes = avances_mes.reset_index(drop=True)
-        saldo_avances = avances_mes.saldo_actual_trasaccion.sum()
-        saldo_avances_1.append(saldo_avances)
+        # Máscara de compra de cartera: se evalúa la pertenencia sobre las
+        # categorías y se expande con los códigos (el código -1 de los nulos
+        # cae en el False agregado al final)
+        cod_transaccion = df_mes_input['cod_transaccion'].astype('category')
+        es_cc_categoria = cod_transaccion.cat.categories.isin(COMPRA_CARTERA_CODES)
+        es_compraCartera = np.append(es_cc_categoria, False)[
+            cod_transaccion.cat.codes.to_numpy()]
+
+        # Máscaras de cada segmento sobre los arreglos de NumPy, sin crear
+        # DataFrames intermedios
+        saldo = df_mes_input['saldo_actual_trasaccion'].to_numpy(dtype=np.float64)
+        es_totalero = df_mes_input['nro_cargos_diferidos'].to_numpy() == 1
+        es_compra = df_mes_input['tipo_transaccion'].isin(TIPOS_COMPRA).to_numpy()
+        es_avance = df_mes_input['tipo_transaccion'].isin(TIPOS_AVANCE).to_numpy()
+
+        # Saldo de compra de cartera, totaleros (sin compra de cartera),
+        # compras y avances (sin compra de cartera ni totaleros)
+        (saldo_compraCartera, saldo_totaleros, saldo_compras, 
+         saldo_avances) = _sumas_segmento(saldo, es_compraCartera, es_totalero, 
+                                          es_compra, es_avance)
         
         # periodos
-        periodo = []
-        num_periodo = df_mes_input.periodo.unique()
-        nombre_periodo = num_periodo[0]
-        periodo.append(nombre_periodo)
-        
-        # periodo
-        df_periodo = pd.DataFrame({"Periodo":periodo})
-        
-        # saldo compra de cartera
-        df_saldo_compraCartera = pd.DataFrame({"Saldo Compra de Cartera":saldo_compraCartera_1})
-        
-        # saldo totaleros
-        df_saldo_totaleros = pd.DataFrame({"Saldo Totaleros":saldo_totaleros_1})
+        nombre_periodo = df_mes_input['periodo'].iat[0]
         
-        # saldo compras
-        df_saldo_compras = pd.DataFrame({"Saldo Compras":saldo_compras_1})
+        df_saldo_anual = pd.DataFrame([{
+            "Periodo": nombre_periodo,
+            "Saldo Compra de Cartera": saldo_compraCartera,
+            "Saldo Totaleros": saldo_totaleros,
+            "Saldo Compras": saldo_compras,
+            "Saldo Avances": saldo_avances,
+            }])
         
-        # saldo avances
-        df_saldo_avances = pd.DataFrame({"Saldo Avances":saldo_avances_1})
-    
-        df_saldo_anual = pd.concat([df_periodo, df_saldo_compraCartera, df_saldo_totaleros, df_saldo_compras, df_saldo_avances], axis='columns')
-        
-        df_saldo_anual["Saldo Compra de Cartera"] =df_saldo_anual["Saldo Compra de Cartera"].astype('str')
-        df_saldo_anual["Saldo Totaleros"] = df_saldo_anual["Saldo Totaleros"].astype('str')
-        df_saldo_anual["Saldo Compras"] = df_saldo_anual["Saldo Compras"].astype('str')
-        df_saldo_anual["Saldo Avances"] = df_saldo_anual["Saldo Avances"].astype('str')
-        
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
+        cursor.fast_executemany = True
 
-        for index, row in df_saldo_anual.iterrows():
-            query_insert = """INSERT INTO df_saldo_anual_segmentado 
-                            ("Periodo","Saldo Compra de Cartera", "Saldo Totaleros", "Saldo Compras","Saldo Avances") 
-                            VALUES (?,?, ?, ?, ?) 
-                                       """
-            cursor.execute(query_insert, [row["Periodo"], row["Saldo Compra de Cartera"], row["Saldo Totaleros"],
-                                          row["Saldo Compras"], row["Saldo Avances"]])
-    
-        con.commit()
+        query_insert = """INSERT INTO df_saldo_anual_segmentado 
+                        ("Periodo","Saldo Compra de Cartera", "Saldo Totaleros", "Saldo Compras","Saldo Avances") 
+                        VALUES (?,?, ?, ?, ?) 
+                                   """
+        columnas_insert = ["Periodo", "Saldo Compra de Cartera", "Saldo Totaleros", "Saldo Compras", "Saldo Avances"]
+        filas = list(df_saldo_anual[columnas_insert].itertuples(index=False, name=None))
+        try:
+            cursor.executemany(query_insert, filas)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
         # print(cursor.rowcount, "Registros insertados satisfactoriamente en SieT..df_saldo_anual_segmentado")
         cursor.close()
         
@@ -620,137 +671,75 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 5 '''
     
-    def tasas_usura_implicita_facial(df_mes_input_facial, usura, implicita):
-        import numpy as np
+    def tasas_usura_implicita_facial(self, df_mes_input_facial, usura, implicita):
         # start_time = pd.Timestamp('now') 
         # print('Ejecutando calculo Facial y cargando de tasas: Usura, Implícita, espere un momento...')
         # print('\n ')
         # Calculo tasas facial
-        tasa_facial = []
-        periodo = []
         columnas = ['tasa_interes', 'TASA_EA', 'saldo_actual_trasaccion','periodo']
         df_mes = df_mes_input_facial[columnas]
-        df_mes['interes_ea'] = (((((df_mes['tasa_interes']/100)+1)**12)-1)*100).round(2)
+        df_mes['interes_ea'] = effective_annual_rate(df_mes['tasa_interes'])
         df_mes = df_mes.rename(columns={"TASA_EA":"tasa_ea_original"})
         df_mes.tasa_ea_original = (df_mes.tasa_ea_original).round(2)
         df_mes.interes_ea = (df_mes.interes_ea).round(2)
-        df_mes_tasas = df_mes[['interes_ea']]
-        df_mes_saldo_porTxc = df_mes[['saldo_actual_trasaccion']]
-        df_mes_saldoTotal = df_mes.saldo_actual_trasaccion.sum()
-        periodo_mes = df_mes.periodo.unique()
-        periodo_mes = periodo_mes[0]
-        
-        factor_pond = []
-        for saldo_porTxc in df_mes_saldo_porTxc.saldo_actual_trasaccion:
-            factor = saldo_porTxc / df_mes_saldoTotal
-            factor_pond.append(factor)
-        
-        df_mes_tasas = df_mes_tasas.interes_ea.to_list()
-        
-        prom_pond = np.multiply(factor_pond, df_mes_tasas)
-        tasa_facial_mes = round(sum(prom_pond),2)
-        tasa_facial.append(tasa_facial_mes)
-        periodo.append(periodo_mes)
+        periodo_mes = df_mes['periodo'].iat[0]
+        
+        # Tasa facial: promedio de interes_ea ponderado por saldo
+        saldos = df_mes['saldo_actual_trasaccion'].to_numpy()
+        tasas = df_mes['interes_ea'].to_numpy()
+        tasa_facial_mes = round(float(np.dot(saldos, tasas) / saldos.sum()), 2)
                 
-        tasa_facial = pd.DataFrame({'periodo':periodo,'tasa_usura':usura,'tasa_implicita':implicita,'tasa_facial':tasa_facial})
+        tasa_facial = pd.DataFrame({'periodo':[periodo_mes],'tasa_usura':[usura],'tasa_implicita':[implicita],
+                                    'tasa_facial':[tasa_facial_mes]})
             
         # print('Calculo de tasa facial completado')
         # print('* ' * 25)
             
-        import pyodbc as sql
-        
-        con = sql.connect(
-            "DRIVER={SQL Server Native Client 11.0};"
-            "SERVER=SADGVSQL2K19U\DREP,57201;"
-            "Trusted_Connection=yes;"
-        )
-    
-        cursor = con.cursor()
+        con = self.sql.pyodbc_conn
         
-        sql_1 = ''' SELECT *                    
-                    FROM SieT..tasas_usura_implicita_facial; '''
+        # Solo se trae el último periodo cargado
+        sql_1 = ''' SELECT TOP 1 periodo, tasa_usura, tasa_implicita, tasa_facial
+                    FROM SieT..tasas_usura_implicita_facial
+                    ORDER BY periodo DESC; '''
                 
         df_tasas = pd.read_sql_query(sql_1, con = con)  
-        con.commit()
-        cursor.close() 
-        
-        df_tasas = df_tasas.iloc[-1:]
         
-        df_tasas = df_tasas[['periodo','tasa_usura','tasa_implicita','tasa_facial']]
-        df_tasas_columns = df_tasas.columns
-        for i in df_tasas_columns[1:]:
-            df_tasas[i] = df_tasas[i].astype('float')
-            
+        df_tasas = df_tasas.astype({'tasa_usura': 'float', 'tasa_implicita': 'float',
+                                    'tasa_facial': 'float'})
 
         df_tasas = pd.concat([df_tasas,tasa_facial])
         df_tasas = df_tasas.reset_index(drop=True)
         
-        rango_columnas = df_tasas.shape[1]
-        z = 1
-        variacion_tasas = []
-        objetivos_destino = []
-        columns = df_tasas.columns
-        
-        for i in range(1,rango_columnas):
-        
-            rango_filas = df_tasas.shape[0]
-            num_fila = 0
-            lista_variacion = [0]
-            nom_column = columns[i]
-            valor_anterior = [0]
-               
-            if num_fila < rango_filas:
-                x = 0
-                y = 1
-                for i in range(0,rango_filas-1):
-                    anterior = float(df_tasas.iloc[x][z])
-                    actual = float(df_tasas.iloc[y][z])
-                    variacion = round(((actual - anterior) / anterior), 5)
-                    lista_variacion.append(variacion)
-                    valor_anterior.append(anterior)
-                    x += 1
-                    y += 1
-                    num_fila += 1
-            z +=1
-            
-            var_saldo_columna = pd.DataFrame({f'Var_{nom_column}':lista_variacion})
-            df_objetivos_destino = pd.DataFrame({f'Objetivos de destino_{nom_column}':valor_anterior})
-            variacion_tasas.append(var_saldo_columna)
-            objetivos_destino.append(df_objetivos_destino)
-            
-        var_saldos = pd.concat(variacion_tasas,  axis='columns')
-        objetivos_destino = pd.concat(objetivos_destino, axis='columns')
-        variacion_objetivos_tasas = pd.concat([var_saldos, objetivos_destino], axis='columns')
-        df_tasas = pd.concat([df_tasas,variacion_objetivos_tasas],axis='columns')
+        # Variación de cada tasa frente al periodo anterior y valor anterior
+        columnas_tasas = ['tasa_usura', 'tasa_implicita', 'tasa_facial']
+        anterior = df_tasas[columnas_tasas].shift(1)
+        var_tasas = ((df_tasas[columnas_tasas] - anterior) / anterior).round(5).fillna(0)
+        objetivos_destino = anterior.fillna(0)
+        df_tasas = pd.concat([df_tasas, var_tasas.add_prefix('Var_'),
+                              objetivos_destino.add_prefix('Objetivos de destino_')],
+                             axis='columns')
         df_tasas = df_tasas.iloc[-1:]
         
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
 
-        for index, row in df_tasas.iterrows():
-            query_insert = """INSERT INTO tasas_usura_implicita_facial 
-                            ("periodo","tasa_usura","tasa_implicita","tasa_facial",
-                             "Var_tasa_usura","Var_tasa_implicita","Var_tasa_facial",
-                             "Objetivos de destino_tasa_usura","Objetivos de destino_tasa_implicita",
-                             "Objetivos de destino_tasa_facial") 
-                            VALUES (?,?, ?, ?, ?,?,?, ?, ?, ?) 
-                                       """
-            cursor.execute(query_insert, [row["periodo"], row["tasa_usura"], row["tasa_implicita"],
-                                          row["tasa_facial"], row["Var_tasa_usura"], 
-                                          row["Var_tasa_implicita"], 
-                                          row["Var_tasa_facial"], 
-                                          row["Objetivos de destino_tasa_usura"], 
-                                          row["Objetivos de destino_tasa_implicita"], 
-                                          row["Objetivos de destino_tasa_facial"]])
-    
-        con.commit()
+        query_insert = """INSERT INTO tasas_usura_implicita_facial 
+                        ("periodo","tasa_usura","tasa_implicita","tasa_facial",
+                         "Var_tasa_usura","Var_tasa_implicita","Var_tasa_facial",
+                         "Objetivos de destino_tasa_usura","Objetivos de destino_tasa_implicita",
+                         "Objetivos de destino_tasa_facial") 
+                        VALUES (?,?, ?, ?, ?,?,?, ?, ?, ?) 
+                                   """
+        columnas_insert = ["periodo", "tasa_usura", "tasa_implicita", "tasa_facial", "Var_tasa_usura", "Var_tasa_implicita", "Var_tasa_facial", "Objetivos de destino_tasa_usura", "Objetivos de destino_tasa_implicita", "Objetivos de destino_tasa_facial"]
+        fila = next(df_tasas[columnas_insert].itertuples(index=False, name=None))
+        try:
+            cursor.execute(query_insert, fila)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
         cursor.close()
         # print('Cargue de tasas: Usura, Implícita completado')
         # print('* ' * 25)
@@ -763,38 +752,36 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 6 '''
     
-    def saldo_to_mes(df_mes_input):
+    def saldo_to_mes(self, df_mes_input):
         # print('Ejecutando procesamiento para saldos por rango de tasas, espere un momento...')
         # print('\n')
         # start_time = pd.Timestamp('now') 
-        
-        import numpy as np
-        ranges = [np.NINF, 0, 1,11,21,24,26,26.5,27,27.5,28,29,30,np.inf]
-        grupo_tasas = ['a. 0%','b. 0.1% - 0.9%', 'c. 1% - 10.9%', 'd. 11% - 20.9%','e. 21% - 23.9%','f. 24% - 25.9%','g. 26% - 26.4%','h. 26.5% - 26.9%', 'i. 27% - 27.4%', 'j. 27.5% - 27.9%', 'k. 28% - 28.9%', 'l. 29% - 29.9%', 'm. >30%']    
             
         df_to = df_mes_input
         df_to = df_to.rename(columns={"TASA_EA":"tasa_ea_original"})
-        df_to['interes_ea'] = (((((df_to['tasa_interes']/100)+1)**12)-1)*100).round(2)
-        periodo = df_to.periodo.unique()
-        periodo = periodo[0]
+        df_to['interes_ea'] = effective_annual_rate(df_to['tasa_interes'])
+        periodo = df_to['periodo'].iat[0]
         # periodo = periodo.strftime("%Y-%m-%d")
     
-        saldo_sr_to = df_to.groupby(by=['tasa_ea_original']).agg({'saldo_actual_trasaccion':'sum'})
-        saldo_sr_to = saldo_sr_to.sort_values(by='saldo_actual_trasaccion',ascending=False)
-        saldo_sr_to = saldo_sr_to.reset_index()
+        # Una sola pasada sobre las transacciones; los saldos por tasa original
+        # y por tasa actual se agregan sobre este resultado, que es pequeño
+        saldo_tasas = df_to.groupby(by=['tasa_ea_original','interes_ea'], sort=False, dropna=False,
+                                    as_index=False)['saldo_actual_trasaccion'].sum()
+        
+        saldo_sr_to = saldo_tasas.groupby(by='tasa_ea_original', sort=False, as_index=False)['saldo_actual_trasaccion'].sum()
+        saldo_sr_to = saldo_sr_to.sort_values(by='saldo_actual_trasaccion',ascending=False, ignore_index=True)
         saldo_sr_to.tasa_ea_original = (saldo_sr_to.tasa_ea_original).round(2)
         saldo_sr_to['mes'] = periodo
         saldo_sr_to['tipo_tasa'] = 'Tasa original'
         
-        saldo_sr_ta = df_to.groupby(by=['interes_ea']).agg({'saldo_actual_trasaccion':'sum'})
-        saldo_sr_ta = saldo_sr_ta.sort_values(by='saldo_actual_trasaccion',ascending=False)
-        saldo_sr_ta = saldo_sr_ta.reset_index()
+        saldo_sr_ta = saldo_tasas.groupby(by='interes_ea', sort=False, as_index=False)['saldo_actual_trasaccion'].sum()
+        saldo_sr_ta = saldo_sr_ta.sort_values(by='saldo_actual_trasaccion',ascending=False, ignore_index=True)
         saldo_sr_ta.interes_ea = (saldo_sr_ta.interes_ea).round(2)
         saldo_sr_ta['mes'] = periodo
         saldo_sr_ta['tipo_tasa'] = 'Tasa actual'
         
         saldo_cr_to = saldo_sr_to
-        saldo_cr_to['rango_tasa_original'] = pd.cut(saldo_cr_to['tasa_ea_original'], bins=ranges, labels= grupo_tasas)
+        saldo_cr_to['rango_tasa_original'] = _rango_tasa(saldo_cr_to['tasa_ea_original'])
         saldo_cr_to = saldo_cr_to.groupby(by=['rango_tasa_original']).agg({'saldo_actual_trasaccion':'sum'})
         saldo_cr_to = saldo_cr_to.sort_values(by='saldo_actual_trasaccion', ascending=False)
     
@@ -806,85 +793,45 @@ class ProcesamientoTC(object):
         saldo_sr = saldo_sr_to
         # return saldo_cr, saldo_sr_to, saldo_sr_ta
        
-        saldo_anual_rango = []
-        saldo_anual_sinRango = []
-        saldo_anual_sinRango_ta = []
-        fs_column_cr = []
-        fs_column_sr = []
-        fs_column_sr_ta = []
-        
         #genera dataframe según rango de tasa
-        primera_columna = saldo_cr[['rango_tasa_original']]
-        saldo_cr = saldo_cr[['saldo_actual_trasaccion','mes']]
-        fs_column_cr.append(primera_columna)
-        saldo_anual_rango.append(saldo_cr)
-        
-        # genera dataframe sin rango de tasa original
-        primera_columna_sr = saldo_sr.iloc[:,0] 
-        saldo_sr = saldo_sr[['saldo_actual_trasaccion','mes','tipo_tasa']]
-        fs_column_sr.append(primera_columna_sr)  
-        saldo_anual_sinRango.append(saldo_sr)
-        
-        # genera dataframe sin rango de tasa actual
-        primera_columna_sr_ta = saldo_sr_ta.iloc[:,0] 
-        saldo_sr_ta = saldo_sr_ta[['saldo_actual_trasaccion','mes','tipo_tasa']]
-        fs_column_sr_ta.append(primera_columna_sr_ta)  
-        saldo_anual_sinRango_ta.append(saldo_sr_ta)
-            
-        primera_columna_rango = pd.concat(fs_column_cr)
-        primera_columna_rango = primera_columna_rango.reset_index(drop=True)
-        saldo_rango = pd.concat(saldo_anual_rango)
-        saldo_rango = saldo_rango.reset_index(drop=True)
-        saldo_to_anual_rango = pd.concat([primera_columna_rango, saldo_rango], axis='columns')
-        
-        primera_columna_sinRango = pd.concat(fs_column_sr)
-        primera_columna_sinRango = primera_columna_sinRango.reset_index(drop=True)
-        saldo_sinRango = pd.concat(saldo_anual_sinRango)
-        saldo_sinRango = saldo_sinRango.reset_index(drop=True)
-        saldo_to_anual_sinRango = pd.concat([primera_columna_sinRango, saldo_sinRango], axis='columns')  
-        
-        primera_columna_sinRango_ta = pd.concat(fs_column_sr_ta)
-        primera_columna_sinRango_ta = primera_columna_sinRango_ta.reset_index(drop=True)
-        saldo_sinRango_ta = pd.concat(saldo_anual_sinRango_ta)
-        saldo_sinRango_ta = saldo_sinRango_ta.reset_index(drop=True)
-        saldo_ta_anual_sinRango = pd.concat([primera_columna_sinRango_ta, saldo_sinRango_ta], axis='columns')  
-  
-        saldo_ta_anual_sinRango = saldo_ta_anual_sinRango.rename(columns={"interes_ea":"interes"})
-        saldo_to_anual_sinRango = saldo_to_anual_sinRango.rename(columns={"tasa_ea_original":"interes"})
-        
-        saldo_sinRango = pd.concat([saldo_ta_anual_sinRango, saldo_to_anual_sinRango])
-        
-        saldo_ta_anual_conRango = saldo_ta_anual_sinRango
-        saldo_to_anual_conRango = saldo_to_anual_sinRango
-        
-        saldo_ta_anual_conRango['rango_tasa'] = pd.cut(saldo_ta_anual_sinRango['interes'], bins=ranges, labels= grupo_tasas)
-        saldo_to_anual_conRango['rango_tasa'] = pd.cut(saldo_to_anual_sinRango['interes'], bins=ranges, labels= grupo_tasas)
-        
-        saldo_conRango = pd.concat([saldo_ta_anual_conRango, saldo_to_anual_conRango])
-        # saldo_conRango.mes = pd.to_datetime(saldo_conRango.mes, format= '%Y%m%d')
+        saldo_to_anual_rango = saldo_cr[['rango_tasa_original','saldo_actual_trasaccion','mes']]
         
-        saldo_conRango.saldo_actual_trasaccion = saldo_conRango.saldo_actual_trasaccion.astype('str')
+        # genera dataframe sin rango de tasa original y de tasa actual
+        columnas_sr = ['saldo_actual_trasaccion','mes','tipo_tasa']
+        saldo_to_anual_sinRango = saldo_sr[['tasa_ea_original'] + columnas_sr].rename(columns={"tasa_ea_original":"interes"})
+        saldo_ta_anual_sinRango = saldo_sr_ta[['interes_ea'] + columnas_sr].rename(columns={"interes_ea":"interes"})
+        
+        saldo_sinRango = pd.concat([saldo_ta_anual_sinRango, saldo_to_anual_sinRango], ignore_index=True)
+        saldo_conRango = saldo_sinRango.assign(rango_tasa=_rango_tasa(saldo_sinRango['interes']))
+        # saldo_conRango.mes = pd.to_datetime(saldo_conRango.mes, format= '%Y%m%d')
         
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
+        cursor.fast_executemany = True
 
-        for index, row in saldo_conRango.iterrows():
-            query_insert = """INSERT INTO df_saldo_anual_cr 
-                            ("interes","saldo_actual_trasaccion","mes","tipo_tasa",
-                              "rango_tasa") 
-                            VALUES (?,?, ?, ?, ?) 
-                                        """
-            cursor.execute(query_insert, [row["interes"], row["saldo_actual_trasaccion"], row["mes"],
-                                          row["tipo_tasa"], row["rango_tasa"]])
-    
-        con.commit()
+        query_insert = """INSERT INTO df_saldo_anual_cr 
+                        ("interes","saldo_actual_trasaccion","mes","tipo_tasa",
+                          "rango_tasa") 
+                        VALUES (?,?, ?, ?, ?) 
+                                    """
+        columnas_insert = ["interes", "saldo_actual_trasaccion", "mes", "tipo_tasa", "rango_tasa"]
+        # mes se envía como date, sin importar si el driver entregó el periodo
+        # como date o como texto, para que coincida con SQL_TYPE_DATE
+        filas = list(saldo_conRango[columnas_insert].assign(mes=pd.Timestamp(periodo).date())
+                     .itertuples(index=False, name=None))
+        # Tipos fijos de los parámetros: el driver no los infiere de la primera
+        # fila (rango_tasa puede venir en None) y arma los buffers una sola vez
+        cursor.setinputsizes([(pyodbc.SQL_DOUBLE, 0, 0), (pyodbc.SQL_DOUBLE, 0, 0),
+                              (pyodbc.SQL_TYPE_DATE, 0, 0), (pyodbc.SQL_WVARCHAR, 50, 0),
+                              (pyodbc.SQL_WVARCHAR, 50, 0)])
+        try:
+            cursor.executemany(query_insert, filas)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
         cursor.close()
         # print('Procesamiento de Rango de Tasas completado satisfactoriamente')
         # print('\n')
@@ -899,7 +846,7 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 7 '''
     
-    def afectacion_100pbs(tasa_usura, df_mes_input):
+    def afectacion_100pbs(self, tasa_usura, df_mes_input):
     
         # start_time  = pd.Timestamp('now')
         
@@ -911,38 +858,20 @@ class ProcesamientoTC(object):
         columnas = ['saldo_actual_trasaccion','tasa_interes','TASA_EA','periodo']
         df = df_mes_input[columnas]
         df = df.rename(columns={"TASA_EA":"tasa_ea_original"})
-        df['interes_ea'] = (((((df['tasa_interes']/100)+1)**12)-1)*100).round(2)
-        periodo = df.periodo.unique()
-        periodo = periodo[0]
+        df['interes_ea'] = effective_annual_rate(df['tasa_interes'])
+        periodo = df['periodo'].iat[0]
         
         df_mes = df[['saldo_actual_trasaccion','tasa_ea_original','interes_ea']]
+        saldo = df_mes['saldo_actual_trasaccion'].to_numpy(dtype=np.float64)
+        tasa_ea = df_mes['tasa_ea_original'].to_numpy(dtype=np.float64)
+        interes_ea = df_mes['interes_ea'].to_numpy(dtype=np.float64)
         
         tasa_usura = tasa_usura
         
         # Usura aumenta 100 pbs
         
         usura_final = tasa_usura + 1
-        df_exp_mas100pbs_usura = df_mes[df_mes['tasa_ea_original'] > tasa_usura]
-        df_exp_mas100pbs_usura = df_exp_mas100pbs_usura.reset_index(drop=True)
-        
-        tasa_final = []
-        for tasa_original in df_exp_mas100pbs_usura['tasa_ea_original']:
-            if tasa_original <= usura_final:
-                tasa_final.append(tasa_original)
-            elif usura_final < tasa_original:
-                tasa_final.append(usura_final)
-                
-        df_tasa_final = pd.DataFrame({"tasa_final":tasa_final})
-        
-        diferencia_de_tasas  = tasa_final - df_exp_mas100pbs_usura['interes_ea']
-        
-        diferencia_de_tasas = pd.DataFrame({"diferencia_tasas": (df_tasa_final['tasa_final'] - df_exp_mas100pbs_usura['interes_ea']) / 100})
-        
-        df_calculo_impacto = pd.concat([df_exp_mas100pbs_usura,diferencia_de_tasas], axis='columns')
-        df_calculo_impacto['impacto_variacion_Npbs'] = df_calculo_impacto['saldo_actual_trasaccion'] * df_calculo_impacto['diferencia_tasas']
-        
-        impacto_pyg_mas100pbs = df_calculo_impacto.impacto_variacion_Npbs.sum()
-        saldo_exp_mas100pbs_usura = df_exp_mas100pbs_usura.saldo_actual_trasaccion.sum()
+        saldo_exp_mas100pbs_usura, impacto_pyg_mas100pbs = _impacto(saldo, tasa_ea, interes_ea, tasa_usura, usura_final)
         
         saldo_expuesto.append(round(saldo_exp_mas100pbs_usura))
         impacto_pyg.append(round(impacto_pyg_mas100pbs))
@@ -963,34 +892,28 @@ class ProcesamientoTC(object):
         tipo_variacion.append('baja 100 Pbs')
         rango.append(periodo)
            
-        afectacion_saldo = pd.DataFrame({"periodo":tipo_variacion})
-        afectacion_saldo["periodo"] = rango
-        afectacion_saldo["saldo_expuesto"] = saldo_expuesto
-        afectacion_saldo["impacto_pyg"] = impacto_pyg
-        afectacion_saldo["tipo_variacion"] = tipo_variacion
-        
-        afectacion_saldo["saldo_expuesto"] = afectacion_saldo["saldo_expuesto"].astype('str')
-        afectacion_saldo["impacto_pyg"] = afectacion_saldo["impacto_pyg"].astype('str')
+        afectacion_saldo = pd.DataFrame({"periodo":rango,"saldo_expuesto":saldo_expuesto,
+                                         "impacto_pyg":impacto_pyg,"tipo_variacion":tipo_variacion})
         
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
 
-        for index, row in afectacion_saldo.iterrows():
-            query_insert = """INSERT INTO afectacion_saldo_100pbs 
-                            ("periodo","saldo_expuesto","impacto_pyg","tipo_variacion") 
-                            VALUES (?,?, ?, ?) 
-                                       """
-            cursor.execute(query_insert, [row["periodo"], row["saldo_expuesto"],
-                                          row["impacto_pyg"], row["tipo_variacion"]])
-    
-        con.commit()
+        query_insert = """INSERT INTO afectacion_saldo_100pbs 
+                        ("periodo","saldo_expuesto","impacto_pyg","tipo_variacion") 
+                        VALUES (?,?, ?, ?), (?,?, ?, ?) 
+                                   """
+        # Las dos filas (sube y baja 100 pbs) van en un solo INSERT
+        columnas_insert = ["periodo", "saldo_expuesto", "impacto_pyg", "tipo_variacion"]
+        filas = afectacion_saldo[columnas_insert].itertuples(index=False, name=None)
+        parametros = [valor for fila in filas for valor in fila]
+        try:
+            cursor.execute(query_insert, parametros)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
         cursor.close()
         # print('Procesamiento: afetación 100 pbs usura completado satisfactoriamente')
         # print('\n')       
@@ -1005,44 +928,29 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 8 '''
     
-    def afectacion_historica_estimada(df_to_input, df_saldo_anual_sr_input, usura_mes_actualizacion,  usura_mes_siguiente_actualizacion):  
+    def afectacion_historica_estimada(self, df_to_input, df_saldo_anual_sr_input, usura_mes_actualizacion,  usura_mes_siguiente_actualizacion):  
         # start_time = pd.Timestamp('now') 
-    
-        saldo_k = []
-        periodo = []
         
         # lectura de saldo capital para cada mes
         df_saldo_anual_sr = df_saldo_anual_sr_input
         df_mes = df_saldo_anual_sr[(df_saldo_anual_sr['tipo_tasa'] == 'Tasa actual')]
         saldo_capital = df_mes.saldo_actual_trasaccion.sum()
-        mes = df_mes.mes.unique()
-        mes = mes[0]
-        saldo_k.append(saldo_capital)
-        periodo.append(mes)
-               
-        saldos = pd.DataFrame({"periodo":periodo,"saldo_capital":saldo_k}) 
+        mes = df_mes['mes'].iat[0]
     
         # Calcular saldo expuesto       
-        saldo_expuesto = []
-        impacto_pyg = []
-        tipo_variacion = []
-        
         columnas = ['saldo_actual_trasaccion','tasa_interes','TASA_EA','periodo']
         df_mes = df_to_input[columnas]
         df_mes = df_mes.rename(columns={"TASA_EA":"tasa_ea_original"})
-        df_mes['interes_ea'] = (((((df_mes['tasa_interes']/100)+1)**12)-1)*100).round(2)
-        periodo = df_mes.periodo.unique()
-        periodo = periodo[0] 
+        df_mes['interes_ea'] = effective_annual_rate(df_mes['tasa_interes'])
             
         df_mes = df_mes[['saldo_actual_trasaccion','tasa_ea_original','interes_ea']]                
+        saldo = df_mes['saldo_actual_trasaccion'].to_numpy(dtype=np.float64)
+        tasa_ea = df_mes['tasa_ea_original'].to_numpy(dtype=np.float64)
+        interes_ea = df_mes['interes_ea'].to_numpy(dtype=np.float64)
         
-        variacion_usura = []
         anterior = usura_mes_actualizacion
         actual = usura_mes_siguiente_actualizacion
         variacion = actual - anterior
-        variacion_usura.append(variacion)
-        df_usura = pd.DataFrame({"tasa_usura":usura_mes_actualizacion,
-                                 "variacion_usura":variacion_usura})
         
         tasa_usura_mes = usura_mes_actualizacion
         variacion_usura_mes = variacion
@@ -1059,87 +967,55 @@ class ProcesamientoTC(object):
             saldo_exp_bajada_usura = df_exp_bajada_usura.saldo_actual_trasaccion.sum()
             impacto_pyg_bajadaNpbs = (saldo_exp_bajada_usura * (abs(variacion_usura_mes)/100)) * (-1)
                 
-            saldo_expuesto.append(round(saldo_exp_bajada_usura, 2))
-            impacto_pyg.append(round(impacto_pyg_bajadaNpbs, 2))
-            var_str = round(variacion_usura_mes * 100)
-            tipo_variacion.append(f'Variacion: {var_str} Pbs') 
+            saldo_expuesto = round(saldo_exp_bajada_usura, 2)
+            impacto_pyg = round(impacto_pyg_bajadaNpbs, 2)
             
         # Si la usura sube:                
-        if variacion_usura_mes > 0:
+        elif variacion_usura_mes > 0:
                 
             usura_final = tasa_usura_mes + abs(variacion_usura_mes)
-            df_exp_subida_usura = df_mes[df_mes['tasa_ea_original'] > tasa_usura_mes]
-            df_exp_subida_usura =df_exp_subida_usura.reset_index(drop=True)
-                
-            tasa_final = []
-            for tasa_original in df_exp_subida_usura['tasa_ea_original']:
-                if tasa_original <= usura_final:
-                    tasa_final.append(tasa_original)
-                elif usura_final < tasa_original:
-                    tasa_final.append(usura_final)
-                        
-            df_tasa_final = pd.DataFrame({"tasa_final":tasa_final})
-            diferencia_de_tasas  = tasa_final - df_exp_subida_usura['interes_ea']
-            diferencia_de_tasas = pd.DataFrame({"diferencia_tasas": (df_tasa_final['tasa_final'] - df_exp_subida_usura['interes_ea']) / 100})
-                
-            df_calculo_impacto = pd.concat([df_exp_subida_usura,diferencia_de_tasas], axis='columns')
-            df_calculo_impacto['impacto_variacion_Npbs'] = df_calculo_impacto['saldo_actual_trasaccion'] * df_calculo_impacto['diferencia_tasas']
-                
-            impacto_pyg_subidaNpbs_usura = df_calculo_impacto.impacto_variacion_Npbs.sum()
-            saldo_exp_subidaNpbs_usura = df_exp_subida_usura.saldo_actual_trasaccion.sum()
+            saldo_exp_subidaNpbs_usura, impacto_pyg_subidaNpbs_usura = _impacto(saldo, tasa_ea, interes_ea, tasa_usura_mes, usura_final)
                 
-            saldo_expuesto.append(round(saldo_exp_subidaNpbs_usura))
-            impacto_pyg.append(round(impacto_pyg_subidaNpbs_usura))
-            var_str = round(variacion_usura_mes * 100)
-            tipo_variacion.append(f'Variacion: {var_str} Pbs')
+            saldo_expuesto = round(saldo_exp_subidaNpbs_usura)
+            impacto_pyg = round(impacto_pyg_subidaNpbs_usura)
                 
-        if variacion_usura_mes == 0:
+        else:
                 
-            saldo_capital_exp_sinVariacion = 0
-            impacto_pyg_sinVariacion = 0
-            saldo_expuesto.append(saldo_capital_exp_sinVariacion)
-            impacto_pyg.append(impacto_pyg_sinVariacion)
-            var_str = round(variacion_usura_mes * 100)
-            tipo_variacion.append(f'Variacion: {var_str} Pbs')
-
-        saldoExp_impactoPyg = pd.DataFrame({"saldo_expuesto":saldo_expuesto,
-                                            "impacto_pyg":impacto_pyg,
-                                            "tipo_variacion":tipo_variacion})
+            saldo_expuesto = 0
+            impacto_pyg = 0
+            
+        var_str = round(variacion_usura_mes * 100)
         
         # Unir saldos de capital, tasas y sus variaciones, saldos expuesto e impacto pyg
-
-        saldos_tasas = pd.concat([saldos, df_usura, saldoExp_impactoPyg], axis='columns')
-        saldos_tasas = saldos_tasas[['periodo','saldo_capital','tasa_usura','variacion_usura','saldo_expuesto','impacto_pyg','tipo_variacion']]
-         
-        saldos_tasas.variacion_usura = saldos_tasas.variacion_usura.round(2)
-        saldos_tasas["saldo_capital"] = saldos_tasas["saldo_capital"].astype('str')
-        saldos_tasas["tasa_usura"] = saldos_tasas["tasa_usura"].astype('str')
-        saldos_tasas["variacion_usura"] = saldos_tasas["variacion_usura"].astype('str')
-        saldos_tasas["saldo_expuesto"] = saldos_tasas["saldo_expuesto"].astype('str')
-        saldos_tasas["impacto_pyg"] = saldos_tasas["impacto_pyg"].astype('str')
+        saldos_tasas = pd.DataFrame([{
+            "periodo": mes,
+            "saldo_capital": saldo_capital,
+            "tasa_usura": usura_mes_actualizacion,
+            "variacion_usura": np.round(variacion, 2),
+            "saldo_expuesto": saldo_expuesto,
+            "impacto_pyg": impacto_pyg,
+            "tipo_variacion": f'Variacion: {var_str} Pbs',
+            }])
         
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
+        cursor.fast_executemany = True
 
-        for index, row in saldos_tasas.iterrows():
-            query_insert = """INSERT INTO afectacion_historica_estimada 
-                            ("periodo","saldo_capital","tasa_usura","variacion_usura",
-                             "saldo_expuesto","impacto_pyg","tipo_variacion") 
-                            VALUES (?,?,?,?,?,?,?) 
-                                       """
-            cursor.execute(query_insert, [row["periodo"], row["saldo_capital"],
-                                          row["tasa_usura"], row["variacion_usura"],
-                                           row["saldo_expuesto"], row["impacto_pyg"],
-                                            row["tipo_variacion"]])
-    
-        con.commit()
+        query_insert = """INSERT INTO afectacion_historica_estimada 
+                        ("periodo","saldo_capital","tasa_usura","variacion_usura",
+                         "saldo_expuesto","impacto_pyg","tipo_variacion") 
+                        VALUES (?,?,?,?,?,?,?) 
+                                   """
+        columnas_insert = ["periodo", "saldo_capital", "tasa_usura", "variacion_usura", "saldo_expuesto", "impacto_pyg", "tipo_variacion"]
+        filas = list(saldos_tasas[columnas_insert].itertuples(index=False, name=None))
+        try:
+            cursor.executemany(query_insert, filas)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
         cursor.close()
         # print('Procesamiento: afectación histórica estimada completada satisfactoriamente')
         # print('\n')             
@@ -1152,105 +1028,51 @@ class ProcesamientoTC(object):
         
     
     ''' SECCIÓN 9 '''
-    def estimacion_sensibilidad(df_input, tasa_usura_input):
+    def estimacion_sensibilidad(self, df_input, tasa_usura_input):
         # start_time = pd.Timestamp('now') 
 
         tasas_usura = tasa_usura_input
     
         variaciones_usura = [-1,-0.6,-0.3,0,0.3,0.6,1]
         
-        saldo_expuesto_completo = []
-        impacto_pyg_completo = []
-        variacion_usura_completo = []
-        periodo = []
-    
         columnas = ['saldo_actual_trasaccion','tasa_interes','TASA_EA','periodo']
         df_mes = df_input[columnas]
         df_mes = df_mes.rename(columns={"TASA_EA":"tasa_ea_original"})
-        df_mes['interes_ea'] = (((((df_mes['tasa_interes']/100)+1)**12)-1)*100).round(2)
-        mes_periodo = df_mes.periodo.unique()
-        mes_periodo = mes_periodo[0] 
+        df_mes['interes_ea'] = effective_annual_rate(df_mes['tasa_interes'])
+        mes_periodo = df_mes['periodo'].iat[0]
             
         df_mes = df_mes[['saldo_actual_trasaccion','tasa_ea_original','interes_ea']]                
+        saldo = df_mes['saldo_actual_trasaccion'].to_numpy(dtype=np.float64)
+        tasa_ea = df_mes['tasa_ea_original'].to_numpy(dtype=np.float64)
+        interes_ea = df_mes['interes_ea'].to_numpy(dtype=np.float64)
             
         tasa_usura_mes = tasas_usura
-                                   
-        for variacion in variaciones_usura:
-            
-            if variacion < 0:
-                minimo = tasa_usura_mes - abs(variacion)
-                
-                df_exp_bajada_usura = df_mes[df_mes['interes_ea'] >= minimo]
-                df_exp_bajada_usura = df_exp_bajada_usura.reset_index(drop=True)
-                saldo_exp_bajada_usura = df_exp_bajada_usura.saldo_actual_trasaccion.sum()
-                impacto_pyg_bajadaNpbs = (saldo_exp_bajada_usura * (abs(variacion)/100)) * (-1)
-                saldo_expuesto_completo.append(saldo_exp_bajada_usura)
-                impacto_pyg_completo.append(impacto_pyg_bajadaNpbs)
-                variacion_usura_completo.append(variacion)
-            
-            if variacion > 0:
-                
-                usura_final = tasa_usura_mes + abs(variacion)
-                df_exp_subida_usura = df_mes[df_mes['tasa_ea_original'] > tasa_usura_mes]
-                df_exp_subida_usura =df_exp_subida_usura.reset_index(drop=True)
-                
-                tasa_final = []
-                for tasa_original in df_exp_subida_usura['tasa_ea_original']:
-                    if tasa_original <= usura_final:
-                        tasa_final.append(tasa_original)
-                    elif usura_final < tasa_original:
-                        tasa_final.append(usura_final)
-                        
-                df_tasa_final = pd.DataFrame({"tasa_final":tasa_final})
-                diferencia_de_tasas  = tasa_final - df_exp_subida_usura['interes_ea']
-                diferencia_de_tasas = pd.DataFrame({"diferencia_tasas": (df_tasa_final['tasa_final'] - df_exp_subida_usura['interes_ea']) / 100})
-                
-                df_calculo_impacto = pd.concat([df_exp_subida_usura,diferencia_de_tasas], axis='columns')
-                df_calculo_impacto['impacto_variacion_Npbs'] = df_calculo_impacto['saldo_actual_trasaccion'] * df_calculo_impacto['diferencia_tasas']
-                
-                impacto_pyg_subidaNpbs_usura = df_calculo_impacto.impacto_variacion_Npbs.sum()
-                saldo_exp_subidaNpbs_usura = df_exp_subida_usura.saldo_actual_trasaccion.sum()
-                
-                saldo_expuesto_completo.append(saldo_exp_subidaNpbs_usura)
-                impacto_pyg_completo.append(impacto_pyg_subidaNpbs_usura)
-                variacion_usura_completo.append(variacion)
-                
-            if variacion == 0:
-                saldo_exp = 0     
-                impacto_pyg = 0
-                saldo_expuesto_completo.append(saldo_exp)
-                impacto_pyg_completo.append(impacto_pyg)
-                variacion_usura_completo.append(variacion)
-            
-            periodo.append(mes_periodo)
-        
-        df_proyeccion = pd.DataFrame({"Variacion Usura":variacion_usura_completo,"Saldo expuesto":saldo_expuesto_completo, "Impacto PyG":impacto_pyg_completo, "Periodo":periodo})    
-
-        df_proyeccion["Variacion Usura"] = df_proyeccion["Variacion Usura"].astype('str')
-        df_proyeccion["Saldo expuesto"] = df_proyeccion["Saldo expuesto"].astype('str')
-        df_proyeccion["Impacto PyG"] = df_proyeccion["Impacto PyG"].astype('str')
-        df_proyeccion["Periodo"] = df_proyeccion["Periodo"].astype('str')
         
-        import pyodbc as sql   
-        '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
-
-        cursor = con.cursor()
-
-        for index, row in df_proyeccion.iterrows():
-            query_insert = """INSERT INTO estimacion_sensibilidad 
-                            ("Variacion Usura","Saldo expuesto","Impacto PyG",
-                             "Periodo") 
-                            VALUES (?,?,?,?) """
-            cursor.execute(query_insert, [row["Variacion Usura"], row["Saldo expuesto"],
-                                          row["Impacto PyG"], row["Periodo"]])
-    
-        con.commit()
-        cursor.close()
+        # Todos los escenarios se calculan a la vez: una fila por variación
+        variaciones = np.array(variaciones_usura, dtype=np.float64)
+        baja = variaciones < 0
+        sube = variaciones > 0
+        saldo_expuesto = np.zeros(len(variaciones))
+        impacto_pyg = np.zeros(len(variaciones))
+        
+        # Si la usura baja, queda expuesto el saldo con tasa actual sobre la nueva usura
+        # (una máscara 1-D por escenario, para no crear arreglos de 3 x N)
+        minimos = tasa_usura_mes - np.abs(variaciones[baja])
+        saldo_expuesto[baja] = [np.nansum(saldo[interes_ea >= minimo]) for minimo in minimos]
+        impacto_pyg[baja] = (saldo_expuesto[baja] * (np.abs(variaciones[baja])/100)) * (-1)
+        
+        # Si la usura sube, las tasas originales sobre la usura suben hasta la nueva usura
+        expuesto = tasa_ea > tasa_usura_mes
+        saldo_exp = saldo[expuesto]
+        usuras_finales = tasa_usura_mes + np.abs(variaciones[sube])
+        tasa_final = np.minimum(tasa_ea[expuesto][None, :], usuras_finales[:, None])
+        saldo_expuesto[sube] = np.nansum(saldo_exp)
+        impacto_pyg[sube] = np.nansum(saldo_exp * (tasa_final - interes_ea[expuesto]) / 100, axis=1)
+        
+        df_proyeccion = pd.DataFrame({"Variacion Usura":variaciones_usura,"Saldo expuesto":saldo_expuesto, 
+                                      "Impacto PyG":impacto_pyg, "Periodo":mes_periodo})    
+        
+        df_proyeccion.to_sql('estimacion_sensibilidad', con=self.sql.engine, if_exists='append', index=False)
         # print('Procesamiento: afectación histórica estimada completada satisfactoriamente')
         # print('\n')         
 
@@ -1263,15 +1085,10 @@ class ProcesamientoTC(object):
     
     
     ''' SECCIÓN 10 '''
-    def actualizar_escenarios_usura(periodo, maximo, percentil_95, promedio, percentil_25, minimo):
+    def actualizar_escenarios_usura(self, periodo, maximo, percentil_95, promedio, percentil_25, minimo):
         
-        import pyodbc as sql   
         '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
+        con = self.sql.pyodbc_conn
 
         cursor = con.cursor()
 
@@ -1291,7 +1108,7 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 11 '''
     
-    def afectacion_ingresos_conTasaMv(df_input ,usura_input_corte, usura_input_mes_nuevo):
+    def afectacion_ingresos_conTasaMv(self, df_input ,usura_input_corte, usura_input_mes_nuevo):
         
         # afectacion_variableTasaMv
         # start_time = pd.Timestamp('now') 
@@ -1299,118 +1116,61 @@ class ProcesamientoTC(object):
         tasas_usura = [usura_input_corte, usura_input_mes_nuevo]
         df_usura = pd.DataFrame({"tasa_usura_ea":tasas_usura})
         df_usura['tasa_usura_ea'] = df_usura['tasa_usura_ea'] / 100
-        df_usura['tasa_usura_mv'] = df_usura['tasa_usura_ea'].apply(lambda x: round((((1+x)**(30/360))-1)*100,2))
+        df_usura['tasa_usura_mv'] = np.round((((1+df_usura['tasa_usura_ea'])**(30/360))-1)*100, 2)
         df_usura['tasa_usura_ea'] = df_usura['tasa_usura_ea'] * 100
         
         
-        variacion_usura = []
-        anterior = float(df_usura.iloc[0][1])
-        actual = float(df_usura.iloc[1][1])
+        anterior = float(df_usura['tasa_usura_mv'].iat[0])
+        actual = float(df_usura['tasa_usura_mv'].iat[1])
         variacion = round(actual - anterior,2)
-        variacion_usura.append(variacion)
         df_usura = df_usura[['tasa_usura_ea','tasa_usura_mv']]
         
         df_usura = df_usura.iloc[:-1,:]
-        df_usura["variacion_usura_mv"] = variacion_usura
+        df_usura["variacion_usura_mv"] = variacion
       
-        impacto_pyg_estimado_tasaVar = []
-    
-        periodo_var = []
-    
         columnas = ['saldo_actual_trasaccion','tasa_interes','periodo']
-        df_mes_var = df_input[columnas]
-        df_mes_var['tasa_interes'] = df_mes_var['tasa_interes'] /100
-        df_mes_var['impacto_pyg'] = df_mes_var.tasa_interes * df_mes_var.saldo_actual_trasaccion
+        df_mes_var = df_input[columnas].copy()
+        df_mes_var['tasa_interes'] /= 100
+        df_mes_var['impacto_pyg'] = df_mes_var['tasa_interes'].to_numpy() * df_mes_var['saldo_actual_trasaccion'].to_numpy()
         impacto_var = df_mes_var.impacto_pyg.sum()
-        mes_periodo_var = df_mes_var.periodo.unique()
-        mes_periodo_var = mes_periodo_var[0] 
-        
-        impacto_pyg_estimado_tasaVar.append(impacto_var)
-        periodo_var.append(mes_periodo_var)
+        mes_periodo_var = df_mes_var['periodo'].iat[0]
         
         # print('Ejecutando calculo de ingresos con tasa M.V.')
         
-        df_afectacion_estimada_tasaCorte = pd.DataFrame({"periodo":periodo_var,"impacto_pyg":impacto_pyg_estimado_tasaVar})
+        df_afectacion_estimada_tasaCorte = pd.DataFrame({"periodo":[mes_periodo_var],"impacto_pyg":[impacto_var],
+                                                         "Impacto":['Ingresos Tasa actual']})
         # df_afectacion_estimada_tasaCorte = pd.concat([df_afectacion_estimada_tasaCorte,df_usura], axis='columns')
-        df_afectacion_estimada_tasaCorte['Impacto'] = 'Ingresos Tasa actual'
         
         # afectacion_constanteTasaMv
     
-        impacto_pyg_estimado_cnste = []
-    
-        periodo_cnste = []
-    
-        columnas = ['saldo_actual_trasaccion','tasa_interes','TASA_EA','periodo']
-        df_mes_cnst = df_input[columnas]
-        df_mes_cnst = df_mes_cnst.rename(columns={"TASA_EA":"tasa_ea_original","tasa_interes":"tasa_interes_mv"})
-        df_mes_cnst['tasa_ea_original'] = df_mes_cnst['tasa_ea_original'] /100
-        df_mes_cnst['tasa_original_mv'] = df_mes_cnst['tasa_ea_original'].apply(lambda x: round((((1+x)**(30/360))-1)*100,2))
-        df_mes_cnst['tasa_original_mv'] = df_mes_cnst['tasa_original_mv'] /100
-        df_mes_cnst['impacto_pyg'] = df_mes_cnst.tasa_original_mv * df_mes_cnst.saldo_actual_trasaccion
-        df_mes_cnst['tasa_original_mv'] = df_mes_cnst['tasa_original_mv'] *100
-        impacto_cnst = df_mes_cnst.impacto_pyg.sum()
-        mes_periodo_cnst = df_mes_cnst.periodo.unique()
-        mes_periodo_cnst = mes_periodo_cnst[0] 
-        
-        impacto_pyg_estimado_cnste.append(impacto_cnst)
-        periodo_cnste.append(mes_periodo_cnst)
+        # Hay pocas tasas originales distintas: se convierte cada una una sola vez
+        # (el código -1 de los nulos toma el NaN agregado al final de la tabla)
+        codigos, tasas_ea = pd.factorize(df_input['TASA_EA'].to_numpy())
+        tabla_mv = np.round((((1+tasas_ea/100)**(30/360))-1)*100, 2) /100
+        tasa_original_mv = np.append(tabla_mv, np.nan)[codigos]
+        saldo = df_input['saldo_actual_trasaccion'].to_numpy()
+        impacto_cnst = np.nansum(tasa_original_mv * saldo)
+        mes_periodo_cnst = df_input['periodo'].iat[0]
+        
         # print(f'Calculo de impacto PyG con tasa original M.V para {mes_periodo_cnst} completado satisfactoriamente')
         # print('\n ')
         # print('Ejecutando...')  
         
-        df_afectacion_estimada_tasaOriginal = pd.DataFrame({"periodo":periodo_cnste,"impacto_pyg":impacto_pyg_estimado_cnste})
+        df_afectacion_estimada_tasaOriginal = pd.DataFrame({"periodo":[mes_periodo_cnst],"impacto_pyg":[impacto_cnst],
+                                                            "Impacto":['Ingresos Tasa original']})
         # df_afectacion_estimada_tasaOriginal = pd.concat([df_afectacion_estimada_tasaOriginal,df_usura], axis='columns')
-        df_afectacion_estimada_tasaOriginal["Impacto"] = 'Ingresos Tasa original'
     
         ingresos_estimados_porTasa = pd.concat([df_afectacion_estimada_tasaCorte,df_afectacion_estimada_tasaOriginal])
         
-        ingresos_estimados_porTasa.impacto_pyg = ingresos_estimados_porTasa.impacto_pyg.astype('str')    
+        ingresos_estimados_porTasa.to_sql('ingresos_estimados_tasaMV', con=self.sql.engine, if_exists='append', 
+                                          index=False)
         
-        import pyodbc as sql   
-        '''Crear conexión con repositorio SQL insertar datos'''
         
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
-
-        cursor = con.cursor()
-        
-        for index, row in ingresos_estimados_porTasa.iterrows():
-            query_insert = """INSERT INTO ingresos_estimados_tasaMV 
-                                ("periodo","impacto_pyg","Impacto") 
-                                VALUES (?,?,?) """
-            cursor.execute(query_insert, [row["periodo"], row["impacto_pyg"],row["Impacto"]])
-
-        con.commit()
-        cursor.close()
-        
-        
-        diferencia_impacto = pd.DataFrame()
-        diferencia_impacto['Impacto en Ingresos'] = [impacto_cnst - impacto_var]
-        diferencia_impacto['periodo'] = [mes_periodo_cnst]
-        diferencia_impacto['tasa_usura_mv'] = [anterior]
-        
-        diferencia_impacto['Impacto en Ingresos'] = diferencia_impacto['Impacto en Ingresos'].astype('str')
-        diferencia_impacto['tasa_usura_mv'] = diferencia_impacto['tasa_usura_mv'].astype('str')
-        
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
-
-        cursor = con.cursor()
+        diferencia_impacto = pd.DataFrame({'Impacto en Ingresos':[impacto_cnst - impacto_var],
+                                           'periodo':[mes_periodo_cnst],'tasa_usura_mv':[anterior]})
         
-        for index, row in diferencia_impacto.iterrows():
-            query_insert = """INSERT INTO diferencia_ingresos_tasaMV 
-                                ("Impacto en Ingresos","periodo","tasa_usura_mv") 
-                                VALUES (?,?,?) """
-            cursor.execute(query_insert, [row["Impacto en Ingresos"], row["periodo"],row["tasa_usura_mv"]])
-
-        con.commit()
-        cursor.close()
+        diferencia_impacto.to_sql('diferencia_ingresos_tasaMV', con=self.sql.engine, if_exists='append', 
+                                  index=False)
         # print('\n ')
         # print(f'Calculos con tasa M.V. del periodo {mes_periodo_cnst} completados satisfactoriamente')        
         # elapsed_time = pd.Timestamp('now') - start_time
@@ -1423,56 +1183,28 @@ class ProcesamientoTC(object):
     
     ''' SECCIÓN 12 '''
     
-    def saldo_usura(tasa_usura, df_mes_input):
+    def saldo_usura(self, tasa_usura, df_mes_input):
     
         # start_time  = pd.Timestamp('now')
 
         
-        saldo_expuesto = []
-        impacto_pyg = []
-        tipo_variacion = []
-        rango = []
-        
         columnas = ['saldo_actual_trasaccion','tasa_interes','TASA_EA','periodo']
         df = df_mes_input[columnas]
         df = df.rename(columns={"TASA_EA":"tasa_ea_original"})
-        df['interes_ea'] = (((((df['tasa_interes']/100)+1)**12)-1)*100).round(2)
-        periodo = df.periodo.unique()
-        periodo = periodo[0]
+        df['interes_ea'] = effective_annual_rate(df['tasa_interes'])
+        periodo = df['periodo'].iat[0]
         
         df_mes = df[['saldo_actual_trasaccion','tasa_ea_original','interes_ea']]
+        saldo = df_mes['saldo_actual_trasaccion'].to_numpy(dtype=np.float64)
+        tasa_ea = df_mes['tasa_ea_original'].to_numpy(dtype=np.float64)
+        interes_ea = df_mes['interes_ea'].to_numpy(dtype=np.float64)
         
         tasa_usura = tasa_usura
         
         # Usura aumenta 450 pbs
         
         usura_final = tasa_usura + 4.5
-        df_exp_mas450pbs_usura = df_mes[df_mes['tasa_ea_original'] > tasa_usura]
-        df_exp_mas450pbs_usura = df_exp_mas450pbs_usura.reset_index(drop=True)
-        
-        tasa_final = []
-        for tasa_original in df_exp_mas450pbs_usura['tasa_ea_original']:
-            if tasa_original <= usura_final:
-                tasa_final.append(tasa_original)
-            elif usura_final < tasa_original:
-                tasa_final.append(usura_final)
-                
-        df_tasa_final = pd.DataFrame({"tasa_final":tasa_final})
-        
-        diferencia_de_tasas  = tasa_final - df_exp_mas450pbs_usura['interes_ea']
-        
-        diferencia_de_tasas = pd.DataFrame({"diferencia_tasas": (df_tasa_final['tasa_final'] - df_exp_mas450pbs_usura['interes_ea']) / 100})
-        
-        df_calculo_impacto = pd.concat([df_exp_mas450pbs_usura,diferencia_de_tasas], axis='columns')
-        df_calculo_impacto['impacto_variacion_Npbs'] = df_calculo_impacto['saldo_actual_trasaccion'] * df_calculo_impacto['diferencia_tasas']
-        
-        impacto_pyg_mas450pbs = df_calculo_impacto.impacto_variacion_Npbs.sum()
-        saldo_exp_mas450pbs_usura = df_exp_mas450pbs_usura.saldo_actual_trasaccion.sum()
-        
-        saldo_expuesto.append(round(saldo_exp_mas450pbs_usura))
-        impacto_pyg.append(round(impacto_pyg_mas450pbs))
-        tipo_variacion.append('sube 450 Pbs')
-        rango.append(periodo)
+        saldo_exp_mas450pbs_usura, impacto_pyg_mas450pbs = _impacto(saldo, tasa_ea, interes_ea, tasa_usura, usura_final)
         
         # Usura disminuye 450 pbs
         
@@ -1482,41 +1214,18 @@ class ProcesamientoTC(object):
         df_exp_menos450pbs_usura = df_exp_menos450pbs_usura.reset_index(drop=True)
         saldo_exp_menos450pbs_usura = df_exp_menos450pbs_usura.saldo_actual_trasaccion.sum()
         impacto_pyg_menos450pbs = (saldo_exp_menos450pbs_usura * 0.045) * (-1)
-        
-        saldo_expuesto.append(round(saldo_exp_menos450pbs_usura, 2))
-        impacto_pyg.append(round(impacto_pyg_menos450pbs,2))
-        tipo_variacion.append('baja 450 Pbs')
-        rango.append(periodo)
            
-        afectacion_saldo = pd.DataFrame({"periodo":tipo_variacion})
-        afectacion_saldo["periodo"] = rango
-        afectacion_saldo["saldo_expuesto"] = saldo_expuesto
-        afectacion_saldo["impacto_pyg"] = impacto_pyg
-        afectacion_saldo["tipo_variacion"] = tipo_variacion
-        
-        afectacion_saldo["saldo_expuesto"] = afectacion_saldo["saldo_expuesto"].astype('str')
-        afectacion_saldo["impacto_pyg"] = afectacion_saldo["impacto_pyg"].astype('str')
+        afectacion_saldo = pd.DataFrame({
+            "periodo":[periodo, periodo],
+            "saldo_expuesto":[round(saldo_exp_mas450pbs_usura), round(saldo_exp_menos450pbs_usura, 2)],
+            "impacto_pyg":[round(impacto_pyg_mas450pbs), round(impacto_pyg_menos450pbs,2)],
+            "tipo_variacion":['sube 450 Pbs', 'baja 450 Pbs'],
+            })
         
-        import pyodbc as sql   
-        '''Crear conexión con repositorio SQL insertar datos'''
-        con = sql.connect(
-                            "DRIVER={SQL Server Native Client 11.0};"
-                            "SERVER=SADGVSQL2K19U\DREP,57201;"
-                            "Database=SieT;"
-                            "Trusted_Connection=yes;")            
-
-        cursor = con.cursor()
-
-        for index, row in afectacion_saldo.iterrows():
-            query_insert = """INSERT INTO saldo_usura 
-                            ("periodo","Saldo expuesto","Impacto PyG","Tipo variacion") 
-                            VALUES (?,?, ?, ?) 
-                                        """
-            cursor.execute(query_insert, [row["periodo"], row["saldo_expuesto"],
-                                          row["impacto_pyg"], row["tipo_variacion"]])
-    
-        con.commit()
-        cursor.close()
+        columnas_sql = {"saldo_expuesto":"Saldo expuesto", "impacto_pyg":"Impacto PyG",
+                        "tipo_variacion":"Tipo variacion"}
+        afectacion_saldo.rename(columns=columnas_sql).to_sql('saldo_usura', con=self.sql.engine, 
+                                                             if_exists='append', index=False)
         # print('Procesamiento: Saldo usura completado satisfactoriamente')        
         # elapsed_time = pd.Timestamp('now') - start_time
         # print('Tiempo de procesamiento fue de ',elapsed_time)   
@@ -1524,7 +1233,7 @@ class ProcesamientoTC(object):
         return afectacion_saldo
     
 
-    def ejecucion_procesamiento_tc(archivo_composicion_saldo,archivo_fact_txc,
+    def ejecucion_procesamiento_tc(self, archivo_fact_txc,
                                    nombre_mes,mes_actualizacion, anio_actualizacion,
                                    tasa_usura_mesActualizacion,tasa_implicita,
                                    tasa_usura_mesSiguiente):
@@ -1534,7 +1243,7 @@ class ProcesamientoTC(object):
         print('\n ')
         print('Calculando composición de saldo...')
         print('\n ')
-        procesamiento_tc.composicion_saldo(archivo_composicion_saldo)
+        self.balance_composition()
         print('\n ')
         print('Composición de saldo calculada satisfactoriamente')
         print('\n ')
@@ -1542,72 +1251,63 @@ class ProcesamientoTC(object):
         print('\n ')
         print(f'Realizando pre procesamiento de datos a {archivo_fact_txc} ...')
         print('NOTA: Este proceso puede tomar la mayoría del tiempo del procesamiento')
-        procesamiento_tc.procesar(archivo_fact_txc, nombre_mes)
+        self.procesar(archivo_fact_txc, nombre_mes)
         print('\n ')
         print('Pre procesamiento realizado satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')
         print('Obteniendo tasas originales...')
-        df_to = procesamiento_tc.tasas_originales(nombre_mes,mes_actualizacion,anio_actualizacion)
+        df_to = self.tasas_originales(nombre_mes,mes_actualizacion,anio_actualizacion)
         print('\n ')
         print('Tasas originales obetenidas satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')
         print('Realizando segmentantación del saldo...')
-        procesamiento_tc.segmentacion_saldo(df_to)
+        self.segmentacion_saldo(df_to)
         print('\n ')
         print('Segmentación del saldo completado satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')
         print('Calculando tasa facial, cargando tasa usura e implicita...')        
-        procesamiento_tc.tasas_usura_implicita_facial(df_to, tasa_usura_mesActualizacion, tasa_implicita)
+        self.tasas_usura_implicita_facial(df_to, tasa_usura_mesActualizacion, tasa_implicita)
         print('\n ')
         print('Cálculo y cargue completado satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')
         print('Segmentando el saldo en rangos de tasas originales y de corte...')        
-        saldo_sinRango = procesamiento_tc.saldo_to_mes(df_to)
+        saldo_sinRango = self.saldo_to_mes(df_to)
         print('\n ')
         print('Segmentación completada satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')
-        print('Calculando afectacion saldo ante subidas o bajadas de la usura en 100 pbs...')        
-        procesamiento_tc.afectacion_100pbs(tasa_usura_mesActualizacion, df_to)
-        print('\n ')
-        print('Cálculo finalizado satisfactoriamente')
-        print('\n ')
-        print('* '*25)
-        print('\n ')
-        print('Calculando afectación histórica estimada por cambios de la usura...')        
-        procesamiento_tc.afectacion_historica_estimada(df_to, saldo_sinRango, tasa_usura_mesActualizacion,tasa_usura_mesSiguiente)
-        print('\n ')
-        print('Cálculo finalizado satisfactoriamente')
-        print('\n ')
-        print('* '*25)
-        print('\n ')
-        print('Calculando estimación sensibilidad...')        
-        procesamiento_tc.estimacion_sensibilidad(df_to, tasa_usura_mesActualizacion)
-        print('\n ')
-        print('Cálculo finalizado satisfactoriamente')
-        print('\n ')
-        print('* '*25)
-        print('\n ')
-        print('Calculando afectación histórica a ingresos con tasa M.V. ...')        
-        procesamiento_tc.afectacion_ingresos_conTasaMv(df_to, tasa_usura_mesActualizacion, tasa_usura_mesSiguiente)
-        print('\n ')
-        print('Cálculo finalizado satisfactoriamente')
-        print('\n ')
-        print('* '*25)
-        print('\n ')
-        print('Calculando saldo usura...')        
-        procesamiento_tc.saldo_usura(tasa_usura_mesActualizacion, df_to)
+        # Las siguientes secciones solo leen df_to y escriben en tablas distintas,
+        # por lo que se ejecutan en paralelo (cada hilo usa su propia conexión)
+        secciones = [
+            ('Afectacion saldo ante subidas o bajadas de la usura en 100 pbs',
+             self.afectacion_100pbs, (tasa_usura_mesActualizacion, df_to)),
+            ('Afectación histórica estimada por cambios de la usura',
+             self.afectacion_historica_estimada, (df_to, saldo_sinRango, tasa_usura_mesActualizacion, tasa_usura_mesSiguiente)),
+            ('Estimación sensibilidad',
+             self.estimacion_sensibilidad, (df_to, tasa_usura_mesActualizacion)),
+            ('Afectación histórica a ingresos con tasa M.V.',
+             self.afectacion_ingresos_conTasaMv, (df_to, tasa_usura_mesActualizacion, tasa_usura_mesSiguiente)),
+            ('Saldo usura',
+             self.saldo_usura, (tasa_usura_mesActualizacion, df_to)),
+            ]
+        print('Calculando afectaciones, sensibilidad y saldo usura...')
+        with ThreadPoolExecutor(max_workers=len(secciones)) as executor:
+            futuros = {executor.submit(seccion, *argumentos): nombre
+                       for nombre, seccion, argumentos in secciones}
+            for futuro in as_completed(futuros):
+                futuro.result()
+                print(f'{futuros[futuro]}: cálculo finalizado satisfactoriamente')
         print('\n ')
-        print('Cálculo finalizado satisfactoriamente')
+        print('Cálculos finalizados satisfactoriamente')
         print('\n ')
         print('* '*25)
         print('\n ')        
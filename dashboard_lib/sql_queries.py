@@ -7,6 +7,8 @@ import pandas as pd
 import datetime
 import sqlalchemy as sqla
 import urllib
+import threading
+import pyodbc
 
 # ----------------------------- 2. Classes ------------------------------------
 class SQLTranslator(object):
@@ -14,21 +16,43 @@ class SQLTranslator(object):
     queries, and manipulation of the tables of interest for the
     dashboard update process.
     """
-
-    @property
-    def engine(self):
-        """Generates an engine that connects to SQL Server, specifically
-        to the SieT database.
-        """
-        params = urllib.parse.quote_plus(
+    def __init__(self):
+        self.conn_str = (
             "DRIVER={SQL Server Native Client 11.0};"
             "SERVER=SADGVSQL2K19U\DREP,57201;"
             "DATABASE=SieT;"
             "Trusted_Connection=yes;"
             )
-        con_str = "mssql+pyodbc:///?odbc_connect={}".format(params)
-        engine = sqla.create_engine(con_str)
-        return engine
+        self._engine = None
+        # Una conexión pyodbc por hilo, para poder correr secciones en
+        # paralelo sin compartir cursores:
+        self._local = threading.local()
+
+    @property
+    def engine(self):
+        """Engine that connects to SQL Server, specifically to the SieT
+        database. It is created on first access and reused afterwards.
+        """
+        if self._engine is None:
+            params = urllib.parse.quote_plus(self.conn_str)
+            con_str = "mssql+pyodbc:///?odbc_connect={}".format(params)
+            # fast_executemany sends each to_sql chunk as a single batch
+            # instead of one INSERT per row:
+            self._engine = sqla.create_engine(con_str, fast_executemany=True)
+        return self._engine
+
+    @property
+    def pyodbc_conn(self):
+        """pyodbc connection to SQL Server, for queries and inserts that
+        use a cursor directly. It is opened on first access from each
+        thread and reused afterwards by that thread. Autocommit is off, so
+        each section commits its own transaction.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = pyodbc.connect(self.conn_str, autocommit=False)
+            self._local.conn = conn
+        return conn
     
     @property
     def connection(self):
@@ -49,39 +73,46 @@ class SQLTranslator(object):
             date (Union[datetime.datetime, str]): date  from which the 
                 information will be deleted.
             connection (sql connection/engine): object that connects to 
-                SQL Server which is needed to excecute the queries.
+                SQL Server which is needed to excecute the queries. If it
+                is a connection, the transaction is left to the caller.
+                Defaults to None, in which case the engine is used.
 
         Returns:
             None
         """ 
-        if not connection:
-            connection = self.connection
-
-        query = f"""
+        # The date is bound once as a parameter and the DELETEs run in a
+        # single transaction:
+        query = sqla.text("""
         DELETE
-        FROM afectacion_historica_estimada WHERE periodo = '{date}';
+        FROM afectacion_historica_estimada WHERE periodo = :date;
         DELETE
-        FROM afectacion_saldo_100pbs WHERE periodo = '{date}';
+        FROM afectacion_saldo_100pbs WHERE periodo = :date;
         DELETE
-        FROM Calendario_DTC WHERE periodo = '{date}';
+        FROM Calendario_DTC WHERE periodo = :date;
         DELETE
-        FROM composicion_saldo WHERE Periodo = '{date}';
+        FROM composicion_saldo WHERE Periodo = :date;
         DELETE
-        FROM df_saldo_anual_cr WHERE mes = '{date}';
+        FROM df_saldo_anual_cr WHERE mes = :date;
         DELETE
-        FROM df_saldo_anual_segmentado WHERE Periodo = '{date}';
+        FROM df_saldo_anual_segmentado WHERE Periodo = :date;
         DELETE
-        FROM diferencia_ingresos_tasaMV WHERE periodo = '{date}';
+        FROM diferencia_ingresos_tasaMV WHERE periodo = :date;
         DELETE
-        FROM estimacion_sensibilidad WHERE Periodo = '{date}';
+        FROM estimacion_sensibilidad WHERE Periodo = :date;
         DELETE
-        FROM ingresos_estimados_tasaMV WHERE periodo = '{date}';
+        FROM ingresos_estimados_tasaMV WHERE periodo = :date;
         DELETE
-        FROM saldo_usura WHERE periodo = '{date}';
+        FROM saldo_usura WHERE periodo = :date;
         DELETE
-        FROM tasas_usura_implicita_facial WHERE periodo = '{date}';
-        """
-        _ = connection.execute(query)
+        FROM tasas_usura_implicita_facial WHERE periodo = :date;
+        """)
+        if connection is None or isinstance(connection, sqla.engine.Engine):
+            engine = connection if connection is not None else self.engine
+            # begin() commits and returns the connection to the pool:
+            with engine.begin() as conn:
+                _ = conn.execute(query, {"date": date})
+        else:
+            _ = connection.execute(query, {"date": date})
         
         print(f"queary_date_control runned for {date}")
     
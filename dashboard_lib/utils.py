@@ -8,6 +8,7 @@ import pandas as pd
 from typing import Union
 import numpy as np
 import datetime
+from functools import cached_property
 from dateutil.relativedelta import relativedelta
 from .custom_exceptions import *
 # ------------------------------- Functions -----------------------------------
@@ -23,13 +24,11 @@ def find_pattern(pattern: str, input_list: list)-> Union[str, None]:
     Returns:
         str: string in input_list that contains the input pattern.
     """    
-    for string in input_list:
-        if pattern in string:
-            return string
-        else: continue
-    print(f'{pattern} was not fount')
+    string = next((string for string in input_list if pattern in string), None)
+    if string is None:
+        print(f'{pattern} was not fount')
 
-    return None
+    return string
 
 def reduce_memory_usage(df: pd.DataFrame, verbose: bool =True)-> pd.DataFrame:
     """Reduces the meory usage of the inputed data frame by changing the
@@ -47,39 +46,13 @@ def reduce_memory_usage(df: pd.DataFrame, verbose: bool =True)-> pd.DataFrame:
                 "float64"]
     start_mem = df.memory_usage().sum()/1024**2
 
-    for col in df.columns:
-        col_type = df[col].dtypes
-        if col_type in numerics:
-            c_min = df[col].min()
-            c_max = df[col].max()
-            if str(col_type)[:3] == "int":
-                if (c_min > np.iinfo(np.int8).min and
-                        c_max < np.iinfo(np.int8).max):
-                    df[col] = df[col].astype(np.int8)
-
-                elif (c_min > np.iinfo(np.int16).min and
-                        c_max < np.iinfo(np.int16).max):
-                    df[col] = df[col].astype(np.int16)
-
-                elif (c_min > np.iinfo(np.int32).min and
-                        c_max < np.iinfo(np.int32).max):
-                    df[col] = df[col].astype(np.int32)
-
-                elif (c_min > np.iinfo(np.int64).min and
-                        c_max < np.iinfo(np.int64).max):
-                    df[col] = df[col].astype(np.int64)
-
-            else:
-                if (c_min > np.finfo(np.float16).min and 
-                        c_max < np.finfo(np.float16).max):
-                    df[col] = df[col].astype(np.float16)
-
-                elif (c_min > np.finfo(np.float32).min and 
-                        c_max < np.finfo(np.float32).max):
-                    df[col] = df[col].astype(np.float32)
-
-                else:
-                    df[col] = df[col].astype(np.float64)
+    # pd.to_numeric finds the smallest dtype in a single pass over each
+    # column (floats are downcast up to float32):
+    for col, col_type in df.select_dtypes(include=numerics).dtypes.items():
+        if col_type.kind == "i":
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        else:
+            df[col] = pd.to_numeric(df[col], downcast="float")
     end_mem = df.memory_usage().sum() / 1024 ** 2
     if verbose:
         print(f"Initial memory usage = {start_mem:.2f}")
@@ -89,6 +62,24 @@ def reduce_memory_usage(df: pd.DataFrame, verbose: bool =True)-> pd.DataFrame:
              )
     return df
 
+def effective_annual_rate(monthly_rate: Union[np.ndarray, pd.Series]
+                          )-> np.ndarray:
+    """Converts monthly interest rates (in percentage) to effective annual
+    rates (in percentage), rounded to 2 decimals.
+
+    Args:
+        monthly_rate (Union[np.ndarray, pd.Series]): monthly interest
+            rates in percentage (e.g. 2.1 for 2.1%).
+
+    Returns:
+        np.ndarray: effective annual rates in percentage.
+    """
+    x = np.asarray(monthly_rate, dtype=np.float64)/100 + 1
+    # x**12 as (x**4)**3 with plain products, cheaper than a pow per element:
+    x2 = x*x
+    x4 = x2*x2
+    return np.round((x4*x4*x4-1)*100, 2)
+
 # --------------------------------- Classes -----------------------------------
 class ReferenceDate(object):
     """This object stores methods and attributes to facilitate the
@@ -151,20 +142,20 @@ class ReferenceDate(object):
         else:
             raise InvalidDate()
     
-    @property
+    @cached_property
     def  last_date(self):
         """Datetime of the last day of the month of interest"""
         last_date = self.ref_date+relativedelta(months=1)-\
             relativedelta(days=self.ref_date.day)
         return last_date
 
-    @property
+    @cached_property
     def first_date(self):
         """Datetime of the first day of the month of interest"""
         first_date = self.ref_date-relativedelta(days=self.ref_date.day-1)
         return first_date
     
-    @property
+    @cached_property
     def prev_last_date(self):
         """Datetime of the last day of the previous month from the date
         of interest.
@@ -172,7 +163,7 @@ class ReferenceDate(object):
         prev_last_date = self.ref_date-relativedelta(days=self.ref_date.day)
         return prev_last_date
     
-    @property
+    @cached_property
     def prev_first_date(self):
         """Datetime of the first day of the previous month from the date
         of interest.